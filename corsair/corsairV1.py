@@ -12,6 +12,7 @@ BAUD_RATE   = 115200
 NUM_LEDS    = 24
 SAMPLE_FPS  = 60          # how many times per second to sample/send
 DOT_RADIUS  = 5           # radius in pixels for the overlay dots
+DEBUG       = "--debug" in sys.argv   # print every frame sent (slow)
 # ──────────────────────────────────────────────────────────────────────────
 
 # ─── GUI FOR LINE SELECTION & DOT OVERLAY ─────────────────────────────────
@@ -172,59 +173,137 @@ def sample_colors_at(points):
 '''
 # ─── SCREEN COLOR EXTRACTION WITH 3×3 AVERAGING ──────────────────────────
 
-def sample_colors_at(points, window=3):
+def sample_colors_at(points, window=3, out=None):
     """
-    For each (x,y) in points, grab a window×window block centered on it,
-    average all pixels in that block, and return a list of averaged (R,G,B) tuples.
+    For each (x,y) in points, average the window×window block centered on it
+    and return the averaged colors as a (num_points × 3) uint8 RGB array.
+    All blocks are read out of ONE grab of their bounding box, so a frame costs
+    a single screen capture instead of one capture per LED.
+    Pass `out` (e.g. SerialLEDController.frame) to write into it instead of
+    allocating a new array.
     """
     half = window // 2
-    colors = []
+    pts = np.asarray(points, dtype=float)
+    # top-left corner of every block
+    xs = pts[:, 0].astype(int) - half
+    ys = pts[:, 1].astype(int) - half
+    # bounding box that covers all blocks
+    left, top = int(xs.min()), int(ys.min())
+    width  = int(xs.max()) - left + window
+    height = int(ys.max()) - top + window
     with mss.mss() as sct:
-        for x, y in points:
-            # define the capture region
-            left = int(x) - half
-            top  = int(y) - half
-            region = {
-                "left": left,
-                "top": top,
-                "width": window,
-                "height": window
-            }
-            img = sct.grab(region)
-            # convert raw bytes to a (window × window × 3) array
-            arr = np.frombuffer(img.rgb, dtype=np.uint8)
-            arr = arr.reshape((window, window, 3))
-            # average over the first two axes (height, width)
-            avg = tuple(arr.mean(axis=(0, 1)).astype(int))
-            colors.append(avg)
-    return colors
+        img = sct.grab({"left": left, "top": top, "width": width, "height": height})
+    # raw BGRA bytes viewed as a (height × width × 4) array, no copy
+    arr = np.frombuffer(img.raw, dtype=np.uint8).reshape((height, width, 4))
+    # gather every block at once: (num_points × window × window × 3), BGR→RGB
+    offsets = np.arange(window)
+    rows = (ys - top)[:, None] + offsets
+    cols = (xs - left)[:, None] + offsets
+    blocks = arr[rows[:, :, None], cols[:, None, :], 2::-1]
+    # average over each block's height and width (integer mean, like int(mean))
+    if out is None:
+        out = np.empty((len(pts), 3), dtype=np.uint8)
+    sums = blocks.sum(axis=(1, 2), dtype=np.uint32)
+    np.floor_divide(sums, window * window, out=out, casting="unsafe")
+    return out
 # ─── SERIAL LED OUTPUT ───────────────────────────────────────────────────
 
 class SerialLEDController:
-    def __init__(self, port, baud, num_leds):
+    """
+    Sends raw R,G,B bytes per LED. The frame lives in one preallocated
+    (num_leds × 3) uint8 array; `frame_bytes` is a memoryview of it, so a
+    send is a single write with no per-LED objects or per-frame buffers.
+    """
+    def __init__(self, port, baud, num_leds, debug=DEBUG, ser=None):
         self.num_leds = num_leds
+        self.debug = debug
+        self.frame = np.zeros((num_leds, 3), dtype=np.uint8)
+        self.frame_bytes = memoryview(self.frame).cast("B")
+        if ser is not None:
+            self.ser = ser
+            return
         self.ser = serial.Serial(port, baud, timeout=1)
         time.sleep(2)  # allow ESP32 to reset
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
 
     def send_colors(self, colors):
+        """Send `colors`: self.frame filled in place (no copy), or any (num_leds × 3) RGB array/list."""
         if len(colors) != self.num_leds:
             raise ValueError(f"Expected {self.num_leds} colors, got {len(colors)}")
+        if colors is not self.frame:
+            np.copyto(self.frame, colors, casting="unsafe")
 
-        # DEBUG: print out what we're sending
-        black_count = sum(1 for c in colors if c == (0, 0, 0))
-        print(f"Sending frame: first 3 LEDs {colors[:3]}, last 3 LEDs {colors[-3:]}, black count = {black_count}/{self.num_leds}")
+        if self.debug:
+            black_count = self.num_leds - np.count_nonzero(self.frame.any(axis=1))
+            print(f"Sending frame: first 3 LEDs {self.frame[:3].tolist()}, last 3 LEDs {self.frame[-3:].tolist()}, "
+                  f"black count = {black_count}/{self.num_leds}")
 
-        data = bytearray()
-        for (r, g, b) in colors:
-            data += bytes((r, g, b))
-        self.ser.write(data)
+        self.ser.write(self.frame_bytes)
         self.ser.flush()
 
     def close(self):
         self.ser.close()
 
+# ─── ENCODER BENCHMARK ───────────────────────────────────────────────────
+
+class NullSerial:
+    """Stands in for the port: counts bytes and costs nothing, so only encoding is timed."""
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+    def flush(self):
+        pass
+
+def encode_bytearray(colors):
+    """The old per-LED encoder, kept only as the benchmark baseline."""
+    data = bytearray()
+    for (r, g, b) in colors:
+        data += bytes((r, g, b))
+    return data
+
+def benchmark(rates=(60, 120, 240), seconds=2.0):
+    """
+    Drive the send path at each frame rate for `seconds` and report the
+    achieved rate, the cost per frame and the old bytearray encoder's cost.
+    No screen or device needed: frames are random colors sent to a NullSerial.
+    """
+    rng = np.random.default_rng(0)
+    controller = SerialLEDController(None, BAUD_RATE, NUM_LEDS, debug=False, ser=NullSerial())
+    frames = rng.integers(0, 256, size=(64, NUM_LEDS, 3), dtype=np.uint8)
+    legacy_frames = [[tuple(c) for c in f.tolist()] for f in frames]
+
+    for fps in rates:
+        interval = 1.0 / fps
+        send_time = 0.0
+        legacy_time = 0.0
+        sent = 0
+        start = next_deadline = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            controller.frame[:] = frames[sent % len(frames)]  # stands in for sample_colors_at(out=...)
+            t0 = time.perf_counter()
+            controller.send_colors(controller.frame)
+            t1 = time.perf_counter()
+            encode_bytearray(legacy_frames[sent % len(frames)])
+            legacy_time += time.perf_counter() - t1
+            send_time += t1 - t0
+            sent += 1
+
+            next_deadline += interval
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline += (-delay // interval) * interval
+        elapsed = time.perf_counter() - start
+        print(f"{fps:>4} FPS target: {sent / elapsed:7.1f} FPS achieved, "
+              f"send {send_time / sent * 1e6:6.1f} µs/frame, old bytearray encoder {legacy_time / sent * 1e6:6.1f} µs/frame, "
+              f"{sent * NUM_LEDS * 3 / elapsed / 1024:6.1f} KiB/s")
+    print(f"Serial budget at {BAUD_RATE} baud: {BAUD_RATE / 10 / 1024:.1f} KiB/s")
+
 # ─── MAIN LOOP ──────────────────────────────────────────────────────────
 
 def main():
@@ -240,18 +319,27 @@ def main():
     controller = SerialLEDController(SERIAL_PORT, BAUD_RATE, NUM_LEDS)
 
     interval = 1.0 / SAMPLE_FPS
+    next_deadline = time.perf_counter()
     try:
         while True:
-            start = time.time()
-            cols = sample_colors_at(points)
-            controller.send_colors(cols)
-            elapsed = time.time() - start
-            if elapsed < interval:
-                time.sleep(interval - elapsed)
+            sample_colors_at(points, out=controller.frame)
+            controller.send_colors(controller.frame)
+
+            # Wait for the next slot on a fixed grid; if we overran, drop the missed slots
+            next_deadline += interval
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline += (-delay // interval) * interval
     except KeyboardInterrupt:
         print("Exiting.")
     finally:
         controller.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python corsairV1.py [--debug]   |   python corsairV1.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark()
+    else:
+        main()
\ No newline at end of file
@@ -1181,6 +1181,7 @@ void handleRoot() {
 */
 
 #include <WiFi.h>
+#include <WiFiUdp.h>
 #include <WebServer.h>
 #include <Adafruit_NeoPixel.h>
 #include <ArduinoJson.h>
@@ -1198,19 +1199,81 @@ void handleRoot() {
 #define MAX_BRIGHTNESS 125
 #define MOUSE_SPEED_THRESHOLD 2.0
 
+// Binary frame protocol (see test_19_04_2025/controller/serial_protocol.py):
+// COBS( version | type | length u16 LE | body | crc16 u16 LE ) 0x00
+#define PROTOCOL_VERSION 1
+#define FRAME_STATE 0x01
+#define FRAME_DELTA 0x02
+#define FRAME_BAUD_PROPOSE 0x10
+#define FRAME_BAUD_ACCEPT 0x11
+#define FRAME_PING 0x12
+#define FRAME_PONG 0x13
+#define FRAME_READY 0x14
+#define FRAME_MARK 0x15
+#define FRAME_ACK 0x16
+#define FLAG_LIGHTS_ENABLED 0x01
+#define FLAG_VIBRATION 0x02
+#define FLAG_SYNC_WITH_AUDIO 0x04
+#define FLAG_MOUSE_CONTROL 0x08
+#define FLAG_HAS_BRIGHTNESS 0x10
+#define FLAG_HAS_MOUSE_SPEED 0x20
+#define FLAG_HAS_COLORS 0x40
+#define FLAG_HAS_BANDS 0x80
+#define DELTA_BANDS_BIT 0x20
+#define MAX_BANDS 16
+#define STATE_HEADER_SIZE 7
+#define RX_BUFFER_SIZE 2048
+#define TX_MAX_BODY 256
+#define DEFAULT_BAUD 115200
+#define MAX_BAUD 2000000
+#define BAUD_REVERT_MS 1000  // Back to DEFAULT_BAUD if no valid frame arrives after a switch
+#define UDP_PORT 4210
+#define UDP_STALE_WINDOW 64  // Sequence numbers this far behind the last one are late duplicates
+#define UDP_HEADER_SIZE 8    // u32 LE session id + u32 LE sequence number
+
 Adafruit_NeoPixel strip(NUM_LEDS, LED_PIN, NEO_GRB + NEO_KHZ800);
 
 const char* ssid = "Naganandana";
 const char* password = "Naganandana";
 
 WebServer server(80);
+WiFiUDP udp;
 
 StaticJsonDocument<3072> parsedDoc;
 String rawInput = "No data yet";
-String serialBuffer = "";
+// Bytes of the frame being received. Serial and UDP each have their own, so a
+// datagram never clobbers a half-received serial frame or JSON line.
+struct RxStream {
+  uint8_t data[RX_BUFFER_SIZE + 1];  // +1 for the JSON terminator
+  size_t length;
+};
+RxStream serialRx = { {0}, 0 };
+RxStream udpRx = { {0}, 0 };
+uint8_t frameBuffer[RX_BUFFER_SIZE];
+unsigned long frames_dropped = 0;
+uint8_t stateBody[STATE_HEADER_SIZE + 3 * 255 + 1 + MAX_BANDS];  // Last full state; delta frames patch it
+size_t stateLength = 0;
+uint8_t txRaw[TX_MAX_BODY + 6];
+uint8_t txEncoded[TX_MAX_BODY + 9];  // COBS overhead + delimiter
+bool baud_unconfirmed = false;
+bool ack_pending = false;          // A FRAME_MARK arrived; ack it after the next strip.show()
+uint8_t ack_seq[2];
+unsigned long baud_switch_time = 0;
+bool udp_started = false;
+uint8_t udpPacket[RX_BUFFER_SIZE + UDP_HEADER_SIZE];
+uint32_t udp_session = 0;
+uint32_t udp_last_seq = 0;
+bool udp_have_seq = false;
+unsigned long udp_stale = 0;
+bool reply_via_udp = false;        // The frame being handled came over UDP: answer the sender
+bool ack_via_udp = false;
+IPAddress udp_remote_ip;
+uint16_t udp_remote_port = 0;
 
 int colors[NUM_COLORS][3];
 int audio_brightness = 0;
+uint8_t bands[MAX_BANDS];  // Per-zone audio levels from the host, bass first
+int band_count = 0;
 bool use_mouse_control = false;
 bool vibration_on = false;
 bool sync_with_audio = false;
@@ -1227,7 +1290,7 @@ int fallback_brightness = 0;
 bool breathe_increasing = true;
 
 void setup() {
-  Serial.begin(115200);
+  Serial.begin(DEFAULT_BAUD);
 
   for (int pin : { HEATER1_PIN, HEATER2_PIN, HEATER3_PIN, VIBE1_PIN, VIBE2_PIN }) {
     pinMode(pin, OUTPUT);
@@ -1239,57 +1302,319 @@ void setup() {
   strip.clear();
   strip.show();
 
+  // Join WiFi in the background: the serial link must not wait for it
   WiFi.begin(ssid, password);
-  while (WiFi.status() != WL_CONNECTED) {
-    delay(500);
-  }
 
   server.on("/", handleRoot);
   server.begin();
+
+  // Tell the host we're listening (it also pings until we answer)
+  uint8_t banner[2] = { PROTOCOL_VERSION, NUM_COLORS };
+  sendFrame(FRAME_READY, banner, 2);
 }
 
 void loop() {
-  readSerialJSON();
+  readSerialFrames();
+  readUdpFrames();
+  checkBaudRevert();
   updateLEDStrip();
   updateActuators();
   server.handleClient();
 }
 
-void readSerialJSON() {
+void readSerialFrames() {
   while (Serial.available()) {
-    char ch = Serial.read();
-    if (ch == '\n') {
-      DeserializationError error = deserializeJson(parsedDoc, serialBuffer);
-      if (!error) {
-        rawInput = serialBuffer;
+    reply_via_udp = false;
+    feedByte(serialRx, Serial.read());
+  }
+}
 
-        audio_brightness = parsedDoc["Brightness"] | 0;
-        received_brightness = parsedDoc.containsKey("Brightness");
+// Same frames over Wi-Fi: each datagram is a u32 LE session id and a u32 LE
+// sequence number followed by whole frames. Late or duplicated datagrams are
+// dropped so the LEDs never step back. A restarted host picks a new random
+// session id, and a new session is always accepted, so its sequence numbers
+// start fresh even though they begin again at 0.
+void readUdpFrames() {
+  if (!udp_started) {
+    if (WiFi.status() != WL_CONNECTED) return;
+    udp.begin(UDP_PORT);
+    udp_started = true;
+  }
+  int size;
+  while ((size = udp.parsePacket()) > 0) {
+    int len = udp.read(udpPacket, sizeof(udpPacket));
+    if (len <= UDP_HEADER_SIZE) continue;
+    uint32_t session = readU32(udpPacket);
+    uint32_t seq = readU32(udpPacket + 4);
+    if (udp_have_seq && session == udp_session && (uint32_t)(udp_last_seq - seq) <= UDP_STALE_WINDOW) {
+      udp_stale++;
+      continue;
+    }
+    udp_session = session;
+    udp_last_seq = seq;
+    udp_have_seq = true;
+    udp_remote_ip = udp.remoteIP();
+    udp_remote_port = udp.remotePort();
+
+    udpRx.length = 0;  // A datagram always starts a new frame
+    reply_via_udp = true;
+    for (int i = UDP_HEADER_SIZE; i < len; i++) feedByte(udpRx, udpPacket[i]);
+    reply_via_udp = false;
+  }
+}
 
-        vibration_on = parsedDoc["vibration"] | false;
-        sync_with_audio = parsedDoc["sync_with_audio"] | false;
-        lights_enabled = parsedDoc["lights_enabled"] | true;
+uint32_t readU32(const uint8_t* p) {
+  return p[0] | (p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24);
+}
 
-        use_mouse_control = parsedDoc["mouse"] | false;
-        mouse_speed = parsedDoc["MouseSpeed"] | 0.0;
+// A 0x00 ends a binary frame; a newline ends a frame only if it started with '{' (JSON fallback)
+void feedByte(RxStream& rx, uint8_t ch) {
+  bool isJson = rx.length > 0 && rx.data[0] == '{';
+  if (ch == 0x00) {
+    handleBinaryFrame(rx);
+    rx.length = 0;
+  } else if (ch == '\n' && isJson) {
+    handleJsonLine(rx);
+    rx.length = 0;
+  } else if (ch == '\r' && isJson) {
+    // ignore
+  } else if (rx.length < RX_BUFFER_SIZE) {
+    rx.data[rx.length++] = ch;
+  } else {
+    rx.length = 0;  // overflow: resync on the next delimiter
+    frames_dropped++;
+  }
+}
 
-        heater_values[0] = parsedDoc["heaters"][0] | 0;
-        heater_values[1] = parsedDoc["heaters"][1] | 0;
-        heater_values[2] = parsedDoc["heaters"][2] | 0;
+uint16_t crc16(const uint8_t* data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
 
-        received_colors = parsedDoc.containsKey("LEDColors");
+// Returns the decoded length, or 0 if the COBS data is malformed
+size_t cobsDecode(const uint8_t* in, size_t len, uint8_t* out) {
+  size_t r = 0, w = 0;
+  while (r < len) {
+    uint8_t code = in[r++];
+    if (code == 0 || r + code - 1 > len) return 0;
+    for (uint8_t i = 1; i < code; i++) out[w++] = in[r++];
+    if (code < 0xFF && r < len) out[w++] = 0;
+  }
+  return w;
+}
 
-        if (received_colors) {
-          for (int i = 0; i < NUM_COLORS; i++) {
-            colors[i][0] = parsedDoc["LEDColors"][i]["G"];
-            colors[i][1] = parsedDoc["LEDColors"][i]["R"];
-            colors[i][2] = parsedDoc["LEDColors"][i]["B"];
-          }
-        }
+void handleBinaryFrame(RxStream& rx) {
+  size_t len = cobsDecode(rx.data, rx.length, frameBuffer);
+  if (len < 6) { frames_dropped++; return; }
+
+  uint16_t crc = frameBuffer[len - 2] | (frameBuffer[len - 1] << 8);
+  uint16_t bodyLength = frameBuffer[2] | (frameBuffer[3] << 8);
+  if (crc16(frameBuffer, len - 2) != crc || frameBuffer[0] != PROTOCOL_VERSION || bodyLength != len - 6) {
+    frames_dropped++;
+    return;
+  }
+  if (!reply_via_udp) baud_unconfirmed = false;  // A valid serial frame arrived, so the current baud rate works
+
+  if (frameBuffer[1] == FRAME_BAUD_PROPOSE && bodyLength == 4) {
+    if (!reply_via_udp) handleBaudProposal(frameBuffer + 4);
+  } else if (frameBuffer[1] == FRAME_MARK && bodyLength == 2) {
+    memcpy(ack_seq, frameBuffer + 4, 2);
+    ack_pending = true;
+    ack_via_udp = reply_via_udp;
+  } else if (frameBuffer[1] == FRAME_PING) {
+    sendFrame(FRAME_PONG, frameBuffer + 4, bodyLength);
+  } else if (frameBuffer[1] == FRAME_STATE) {
+    if (bodyLength > sizeof(stateBody)) { frames_dropped++; return; }
+    memcpy(stateBody, frameBuffer + 4, bodyLength);
+    stateLength = bodyLength;
+    applyStateFrame(stateBody, stateLength);
+  } else if (frameBuffer[1] == FRAME_DELTA) {
+    if (stateLength > 0 && applyDeltaFrame(frameBuffer + 4, bodyLength)) {
+      applyStateFrame(stateBody, stateLength);
+    } else {
+      stateLength = 0;  // No keyframe yet, or a bad delta: wait for the next keyframe
+      frames_dropped++;
+    }
+  }
+}
+
+size_t cobsEncode(const uint8_t* in, size_t len, uint8_t* out) {
+  size_t w = 1, codeAt = 0;
+  uint8_t code = 1;
+  for (size_t r = 0; r < len; r++) {
+    if (in[r] == 0) {
+      out[codeAt] = code;
+      codeAt = w++;
+      code = 1;
+    } else {
+      out[w++] = in[r];
+      if (++code == 0xFF) {
+        out[codeAt] = code;
+        codeAt = w++;
+        code = 1;
       }
-      serialBuffer = "";
-    } else if (ch != '\r') {
-      serialBuffer += ch;
+    }
+  }
+  out[codeAt] = code;
+  return w;
+}
+
+void sendFrame(uint8_t type, const uint8_t* body, size_t len) {
+  if (len > TX_MAX_BODY) return;
+  txRaw[0] = PROTOCOL_VERSION;
+  txRaw[1] = type;
+  txRaw[2] = len & 0xFF;
+  txRaw[3] = len >> 8;
+  memcpy(txRaw + 4, body, len);
+  uint16_t crc = crc16(txRaw, len + 4);
+  txRaw[len + 4] = crc & 0xFF;
+  txRaw[len + 5] = crc >> 8;
+  size_t encodedLength = cobsEncode(txRaw, len + 6, txEncoded);
+  txEncoded[encodedLength++] = 0x00;
+  if (reply_via_udp) {
+    udp.beginPacket(udp_remote_ip, udp_remote_port);
+    udp.write(txEncoded, encodedLength);
+    udp.endPacket();
+  } else {
+    Serial.write(txEncoded, encodedLength);
+  }
+}
+
+// Accept any rate up to MAX_BAUD: answer at the old rate, then switch
+void handleBaudProposal(const uint8_t* body) {
+  uint32_t baud = body[0] | (body[1] << 8) | ((uint32_t)body[2] << 16) | ((uint32_t)body[3] << 24);
+  if (baud < DEFAULT_BAUD || baud > MAX_BAUD) baud = DEFAULT_BAUD;
+  uint8_t reply[4] = { (uint8_t)baud, (uint8_t)(baud >> 8), (uint8_t)(baud >> 16), (uint8_t)(baud >> 24) };
+  sendFrame(FRAME_BAUD_ACCEPT, reply, 4);
+  Serial.flush();
+  if (baud != DEFAULT_BAUD) {
+    Serial.updateBaudRate(baud);
+    baud_unconfirmed = true;
+    baud_switch_time = millis();
+  }
+  serialRx.length = 0;
+}
+
+void checkBaudRevert() {
+  if (baud_unconfirmed && millis() - baud_switch_time > BAUD_REVERT_MS) {
+    Serial.updateBaudRate(DEFAULT_BAUD);
+    baud_unconfirmed = false;
+    serialRx.length = 0;
+  }
+}
+
+// Delta body: field mask | changed fields | range count | (start, count, R G B ...) per range
+bool applyDeltaFrame(const uint8_t* delta, size_t len) {
+  static const uint8_t fieldOffset[5] = { 0, 1, 2, 4, 5 };
+  static const uint8_t fieldSize[5] = { 1, 1, 2, 1, 1 };
+  size_t pos = 1;
+  if (len < 2) return false;
+
+  for (int bit = 0; bit < 5; bit++) {
+    if (delta[0] & (1 << bit)) {
+      if (pos + fieldSize[bit] > len) return false;
+      memcpy(stateBody + fieldOffset[bit], delta + pos, fieldSize[bit]);
+      pos += fieldSize[bit];
+    }
+  }
+  if (delta[0] & DELTA_BANDS_BIT) {
+    size_t bandsAt = STATE_HEADER_SIZE + 3 * (size_t)stateBody[6] + 1;
+    if (bandsAt >= stateLength || pos + (stateLength - bandsAt) > len) return false;
+    memcpy(stateBody + bandsAt, delta + pos, stateLength - bandsAt);
+    pos += stateLength - bandsAt;
+  }
+  if (pos >= len) return false;
+  int ranges = delta[pos++];
+  for (int r = 0; r < ranges; r++) {
+    if (pos + 2 > len) return false;
+    int start = delta[pos], count = delta[pos + 1];
+    pos += 2;
+    if (start + count > stateBody[6] || pos + 3 * count > len) return false;
+    memcpy(stateBody + STATE_HEADER_SIZE + 3 * start, delta + pos, 3 * count);
+    pos += 3 * count;
+  }
+  return pos == len;
+}
+
+void applyStateFrame(const uint8_t* body, size_t len) {
+  if (len < STATE_HEADER_SIZE) {
+    frames_dropped++;
+    return;
+  }
+  uint8_t flags = body[0];
+  size_t bandsAt = STATE_HEADER_SIZE + 3 * (size_t)body[6];
+  bool hasBands = flags & FLAG_HAS_BANDS;
+  if (hasBands ? (bandsAt >= len || body[bandsAt] > MAX_BANDS || len != bandsAt + 1 + body[bandsAt]) : len != bandsAt) {
+    frames_dropped++;
+    return;
+  }
+  int led_count = body[6];
+  const uint8_t* rgb = body + STATE_HEADER_SIZE;
+
+  received_brightness = flags & FLAG_HAS_BRIGHTNESS;
+  audio_brightness = received_brightness ? body[1] : 0;
+  vibration_on = flags & FLAG_VIBRATION;
+  sync_with_audio = flags & FLAG_SYNC_WITH_AUDIO;
+  lights_enabled = flags & FLAG_LIGHTS_ENABLED;
+  use_mouse_control = flags & FLAG_MOUSE_CONTROL;
+  mouse_speed = (flags & FLAG_HAS_MOUSE_SPEED) ? (body[2] | (body[3] << 8)) / 100.0 : 0.0;
+  band_count = hasBands ? body[bandsAt] : 0;
+  memcpy(bands, body + bandsAt + 1, band_count);
+  for (int i = 0; i < 3; i++) {
+    heater_values[i] = (body[5] >> (2 * i)) & 0x3;
+  }
+
+  received_colors = flags & FLAG_HAS_COLORS;
+  if (received_colors) {
+    for (int i = 0; i < NUM_COLORS; i++) {
+      bool present = i < led_count;
+      colors[i][0] = present ? rgb[3 * i + 1] : 0;  // G
+      colors[i][1] = present ? rgb[3 * i] : 0;      // R
+      colors[i][2] = present ? rgb[3 * i + 2] : 0;  // B
+    }
+  }
+  rawInput = "binary state frame, " + String(led_count) + " LEDs, brightness " + String(audio_brightness);
+}
+
+void handleJsonLine(RxStream& rx) {
+  rx.data[rx.length] = '\0';
+  DeserializationError error = deserializeJson(parsedDoc, (const char*)rx.data);
+  if (error) {
+    frames_dropped++;
+    return;
+  }
+  rawInput = (const char*)rx.data;
+
+  audio_brightness = parsedDoc["Brightness"] | 0;
+  received_brightness = parsedDoc.containsKey("Brightness");
+  JsonArray bandArray = parsedDoc["Bands"];
+  band_count = min((int)bandArray.size(), MAX_BANDS);
+  for (int i = 0; i < band_count; i++) bands[i] = bandArray[i] | 0;
+
+  vibration_on = parsedDoc["vibration"] | false;
+  sync_with_audio = parsedDoc["sync_with_audio"] | false;
+  lights_enabled = parsedDoc["lights_enabled"] | true;
+
+  use_mouse_control = parsedDoc["mouse"] | false;
+  mouse_speed = parsedDoc["MouseSpeed"] | 0.0;
+
+  heater_values[0] = parsedDoc["heaters"][0] | 0;
+  heater_values[1] = parsedDoc["heaters"][1] | 0;
+  heater_values[2] = parsedDoc["heaters"][2] | 0;
+
+  received_colors = parsedDoc.containsKey("LEDColors");
+
+  if (received_colors) {
+    for (int i = 0; i < NUM_COLORS; i++) {
+      colors[i][0] = parsedDoc["LEDColors"][i]["G"];
+      colors[i][1] = parsedDoc["LEDColors"][i]["R"];
+      colors[i][2] = parsedDoc["LEDColors"][i]["B"];
     }
   }
 }
@@ -1298,6 +1623,7 @@ void updateLEDStrip() {
   if (!lights_enabled) {
     strip.clear();
     strip.show();
+    acknowledgeShownFrame();
     return;
   }
   if (!received_colors && !received_brightness) {
@@ -1310,6 +1636,7 @@ void updateLEDStrip() {
           (fallback_b * fallback_brightness * MAX_BRIGHTNESS) / 65025));
       }
       strip.show();
+      acknowledgeShownFrame();
       fallback_brightness += (breathe_increasing ? 1 : -1);
       if (fallback_brightness >= 255) breathe_increasing = false;
       if (fallback_brightness <= 0) breathe_increasing = true;
@@ -1326,6 +1653,21 @@ void updateLEDStrip() {
       }
     }
     strip.show();
+    acknowledgeShownFrame();
+  } else if (band_count > 0) {
+    // One band per zone: bass drives the first section, treble the last
+    int section = NUM_LEDS / NUM_COLORS;
+    for (int i = 0; i < NUM_COLORS; i++) {
+      int scaled = map(bands[i * band_count / NUM_COLORS], 0, 255, 0, MAX_BRIGHTNESS);
+      for (int j = 0; j < section; j++) {
+        strip.setPixelColor(i * section + j, strip.Color(
+          (fallback_g * scaled) / 255,
+          (fallback_r * scaled) / 255,
+          (fallback_b * scaled) / 255));
+      }
+    }
+    strip.show();
+    acknowledgeShownFrame();
   } else if (received_brightness) {
     int scaled = map(audio_brightness, 0, 255, 0, MAX_BRIGHTNESS);
     for (int i = 0; i < NUM_LEDS; i++) {
@@ -1335,6 +1677,17 @@ void updateLEDStrip() {
         (fallback_b * scaled) / 255));
     }
     strip.show();
+    acknowledgeShownFrame();
+  }
+}
+
+// Latency instrumentation: tell the host the marked frame is on the LEDs now
+void acknowledgeShownFrame() {
+  if (ack_pending) {
+    reply_via_udp = ack_via_udp;
+    sendFrame(FRAME_ACK, ack_seq, 2);
+    reply_via_udp = false;
+    ack_pending = false;
   }
 }
 
@@ -1373,6 +1726,7 @@ void handleRoot() {
   html += "<style>body{font-family:Arial;margin:20px;} pre{background:#f4f4f4;padding:10px;border-radius:10px;}</style>";
   html += "<h2>ESP32 Serial JSON Viewer</h2>";
   html += "<h3>Raw Input:</h3><pre>" + rawInput + "</pre>";
+  html += "<p>Dropped frames: " + String(frames_dropped) + "</p>";
   html += "<h3>Parsed Values:</h3><pre>";
 
   for (JsonPair kv : parsedDoc.as<JsonObject>()) {
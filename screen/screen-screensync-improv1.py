@@ -141,35 +141,24 @@ def get_screen_grid_colors():
         center_x2 = int(width * (0.5 + FLASH_DETECTION_ZONE / 2))
         center_y2 = int(height * (0.5 + FLASH_DETECTION_ZONE / 2))
 
-        # Extract colors from each grid section
-        grid_colors = []
-        flash_detected = False
-        flash_color = None
-
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                # Define the box region
-                x1, y1 = col * box_width, row * box_height
-                x2, y2 = x1 + box_width, y1 + box_height
-
-                # Crop the section
-                section = img_array[y1:y2, x1:x2]
-
-                # Compute the mean color in the section
-                avg_color = np.mean(section, axis=(0, 1)).astype(int)
-
-                # Convert BGR to RGB
-                r, g, b = avg_color[0].item(), avg_color[1].item(), avg_color[2].item()
-
-                # Store the color
-                grid_colors.append({"R": r, "G": g, "B": b})
-
-                # Check for flash detection in center
-                if center_x1 < x1 < center_x2 and center_y1 < y1 < center_y2:
-                    brightness = (r + g + b) / 3
-                    if brightness > FLASH_BRIGHTNESS_THRESHOLD:
-                        flash_detected = True
-                        flash_color = {"R": r, "G": g, "B": b}
+        # Extract colors from every grid section at once: crop to a multiple of the grid, reshape, reduce
+        cells = img_array[:GRID_ROWS * box_height, :GRID_COLS * box_width]
+        cells = cells.reshape(GRID_ROWS, box_height, GRID_COLS, box_width, -1)
+        avg_colors = cells.mean(axis=(1, 3)).astype(int)[:, :, :3].reshape(-1, 3).tolist()
+        grid_colors = [{"R": r, "G": g, "B": b} for r, g, b in avg_colors]
+
+        # Check for flash detection in center, on a finer CENTER_GRID_ROWS x CENTER_GRID_COLS grid
+        center = img_array[center_y1:center_y2, center_x1:center_x2]
+        center_height = center.shape[0] // CENTER_GRID_ROWS
+        center_width = center.shape[1] // CENTER_GRID_COLS
+        center = center[:CENTER_GRID_ROWS * center_height, :CENTER_GRID_COLS * center_width]
+        center = center.reshape(CENTER_GRID_ROWS, center_height, CENTER_GRID_COLS, center_width, -1)
+        center_colors = center.mean(axis=(1, 3)).astype(int)[:, :, :3].reshape(-1, 3)
+
+        brightest = int(center_colors.sum(axis=1).argmax())
+        r, g, b = center_colors[brightest].tolist()
+        flash_detected = (r + g + b) / 3 > FLASH_BRIGHTNESS_THRESHOLD
+        flash_color = {"R": r, "G": g, "B": b} if flash_detected else None
 
         return grid_colors, flash_detected, flash_color, img_array
 
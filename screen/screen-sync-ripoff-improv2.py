@@ -133,25 +133,15 @@ def get_screen_grid_colors():
         box_width = width // GRID_COLS
         box_height = height // GRID_ROWS
 
-        # Extract colors from each grid section
-        grid_colors = []
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                # Define the box region
-                x1, y1 = col * box_width, row * box_height
-                x2, y2 = x1 + box_width, y1 + box_height
-
-                # Crop the section
-                section = img_array[y1:y2, x1:x2]
-
-                # Compute the mean color in the section
-                avg_color = np.mean(section, axis=(0, 1)).astype(int)
+        # Extract colors from every grid section at once: crop to a multiple of the grid, reshape, reduce
+        cells = img_array[:GRID_ROWS * box_height, :GRID_COLS * box_width]
+        cells = cells.reshape(GRID_ROWS, box_height, GRID_COLS, box_width, -1)
+        avg_colors = cells.mean(axis=(1, 3)).astype(int)[:, :, :3].reshape(-1, 3).tolist()
 
-                # Convert BGR to RGB
-                r, g, b = avg_color[0].item(), avg_color[1].item(), avg_color[2].item()
-
-                # Store the color
-                grid_colors.append({"R": r, "G": g, "B": b})  # Ensure Python int
+        grid_colors = []
+        for r, g, b in avg_colors:
+            # Store the color
+            grid_colors.append({"R": r, "G": g, "B": b})  # Ensure Python int
 
         return grid_colors
 
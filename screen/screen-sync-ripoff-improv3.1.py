@@ -101,16 +101,14 @@ def get_screen_grid_colors():
         box_width = width // GRID_COLS
         box_height = height // GRID_ROWS
 
-        grid_colors = []
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                x1, y1 = col * box_width, row * box_height
-                x2, y2 = x1 + box_width, y1 + box_height
-                section = img_rgb[y1:y2, x1:x2]
-
-                avg_color = np.mean(section, axis=(0, 1)).astype(int)
+        # Average all cells at once: crop to a multiple of the grid, reshape, reduce
+        cells = img_rgb[:GRID_ROWS * box_height, :GRID_COLS * box_width]
+        cells = cells.reshape(GRID_ROWS, box_height, GRID_COLS, box_width, -1)
+        avg_colors = cells.mean(axis=(1, 3)).astype(int)[:, :, :3].tolist()
 
-                r, g, b = avg_color[0].item(), avg_color[1].item(), avg_color[2].item()
+        grid_colors = []
+        for row, row_colors in enumerate(avg_colors):
+            for col, (r, g, b) in enumerate(row_colors):
                 grid_colors.append({"R": r, "G": g, "B": b, "row": row, "col": col})
 
         return grid_colors
@@ -411,18 +411,16 @@ def get_screen_grid_colors():
         box_height = img_rgb.shape[0] // GRID_ROWS
         grid_colors = []
 
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                x1, y1 = col * box_width, row * box_height
-                x2, y2 = x1 + box_width, y1 + box_height
-                section = img_rgb[y1:y2, x1:x2]
+        # Average all cells at once: crop to a multiple of the grid, reshape, reduce
+        cells = img_rgb[:GRID_ROWS * box_height, :GRID_COLS * box_width]
+        cells = cells.reshape(GRID_ROWS, box_height, GRID_COLS, box_width, 3)
+        avg_colors = cells.mean(axis=(1, 3)).astype(int).reshape(-1, 3)
 
-                avg_color = np.mean(section, axis=(0, 1)).astype(int)
-                r, g, b = avg_color.tolist()
-                brightness = np.sqrt(0.299 * (r**2) + 0.587 * (g**2) + 0.114 * (b**2))
+        for r, g, b in avg_colors.tolist():
+            brightness = np.sqrt(0.299 * (r**2) + 0.587 * (g**2) + 0.114 * (b**2))
 
-                if brightness > BRIGHTNESS_THRESHOLD:
-                    grid_colors.append({"R": r, "G": g, "B": b})
+            if brightness > BRIGHTNESS_THRESHOLD:
+                grid_colors.append({"R": r, "G": g, "B": b})
 
         return grid_colors[:NUM_DISTINCT_COLORS]
 
@@ -849,11 +849,18 @@ latest_json_data = None
 CONTROL_JSON_PATH = os.path.join(os.path.dirname(__file__), "control_state.json")
 SCREEN_POINTS_PATH = os.path.join(os.path.dirname(__file__), "screen_points.json")
 
+screen_points_cache = {"mtime": None, "points": []}
+
 def load_screen_points():
+    """Return screen points, re-parsing screen_points.json only when its mtime changes."""
     try:
-        with open(SCREEN_POINTS_PATH, "r") as f:
-            raw_points = json.load(f)
-            return [tuple(p) for p in raw_points]
+        mtime = os.path.getmtime(SCREEN_POINTS_PATH)
+        if mtime != screen_points_cache["mtime"]:
+            with open(SCREEN_POINTS_PATH, "r") as f:
+                raw_points = json.load(f)
+            screen_points_cache["points"] = [tuple(p) for p in raw_points]
+            screen_points_cache["mtime"] = mtime
+        return screen_points_cache["points"]
     except Exception as e:
         print(f"⚠️ Failed to load screen_points.json: {e}")
         return []
@@ -67,20 +67,19 @@ def get_equidistant_points(p0, p1, n):
 
 def sample_colors_at(points, window=3):
     half = window // 2
-    colors = []
+    if not points:
+        return []
+    pts = np.asarray(points, dtype=float)
+    xs = pts[:, 0].astype(int) - half
+    ys = pts[:, 1].astype(int) - half
+    left, top = int(xs.min()), int(ys.min())
+    width = int(xs.max()) - left + window
+    height = int(ys.max()) - top + window
     with mss.mss() as sct:
-        for x, y in points:
-            left = int(x) - half
-            top = int(y) - half
-            region = {
-                "left": left,
-                "top": top,
-                "width": window,
-                "height": window
-            }
-            img = sct.grab(region)
-            arr = np.frombuffer(img.rgb, dtype=np.uint8)
-            arr = arr.reshape((window, window, 3))
-            avg = tuple(arr.mean(axis=(0, 1)).astype(int))
-            colors.append(avg)
-    return colors
\ No newline at end of file
+        img = sct.grab({"left": left, "top": top, "width": width, "height": height})
+    arr = np.frombuffer(img.raw, dtype=np.uint8).reshape((height, width, 4))
+    offsets = np.arange(window)
+    rows = (ys - top)[:, None] + offsets
+    cols = (xs - left)[:, None] + offsets
+    patches = arr[rows[:, :, None], cols[:, None, :], 2::-1]
+    return [tuple(c) for c in patches.mean(axis=(1, 2)).astype(int).tolist()]
\ No newline at end of file
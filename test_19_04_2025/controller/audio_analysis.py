@@ -0,0 +1,631 @@
+import math
+import sys
+import time
+import tracemalloc
+import wave
+from collections import deque
+import numpy as np
+
+# ** Audio Band Analyzer**
+# Splits the audio into log-spaced frequency bands (bass on the left, treble
+# on the right), one per LED color zone. Every callback block goes into a
+# ring buffer holding the latest FFT_SIZE samples, so consecutive analysis
+# windows overlap by FFT_SIZE - block size. The Hann window, the FFT
+# buffers and the bin -> band tables are built once. Per-block work is
+# in-place NumPy: no Python loops over bins or samples.
+# Band levels are 0-255 on a dB scale and are sent as "Bands" next to "Brightness".
+#
+# BeatTracker reuses the same spectrum. Onsets are spectral-flux peaks above
+# an adaptive threshold (mean + k * std of the last second of flux). The tempo
+# comes from a decaying histogram of inter-onset intervals, and a beat clock
+# locked to that tempo gives the beat count and the phase (0 at each beat,
+# rising to 1). With sync_with_audio on, the phase turns Brightness into a
+# pulse on every beat, which also drives the vibration motors.
+# Time is counted in samples, so a WAV file gives the same beats as live input.
+#
+# AudioPipeline is the whole sd.InputStream callback. It runs on PortAudio's
+# thread about 43 times a second, where a GC pause means an audio glitch, so
+# it never allocates a block-sized array. Energy is np.dot(x, x), Brightness
+# is smoothed with a running sum over a ring of levels, and the results go
+# out through a seqlock slot that the send thread reads without a lock.
+# Brightness is the smoothed RMS relative to an automatic gain level. That
+# level tracks the AGC_PERCENTILE of the raw (unsmoothed) block RMS: each block
+# nudges it up if the block is louder and down if it is quieter, in dB steps
+# weighted so that it settles where AGC_PERCENTILE of the blocks are quieter.
+# It falls at AGC_RELEASE_DB_PER_SECOND in a quiet passage and rises 19 times
+# faster. The level maps to AGC_HEADROOM_DB below 255, so typical content sits
+# mid-range with room above it for louder moments. Quiet content still
+# fills the range, loud content no longer pins it at 255, and the web UI's
+# audio gain slider adds AUDIO_GAIN_STEP_DB of gain per step.
+#
+# The stream's block size and PortAudio latency come from control_state.json
+# ("audio_preset", optionally overridden by "audio_blocksize" / "audio_latency").
+# Smaller blocks react sooner but call back more often. CallbackTimer measures
+# the real callback interval, its jitter, the input latency (ADC -> callback,
+# from PortAudio's time info) and the callback's share of the CPU.
+#
+#   python audio_analysis.py            # microbenchmark: cost per 1024-sample block
+#   python audio_analysis.py --alloc    # bytes allocated per callback, old vs new
+#   python audio_analysis.py --presets  # callback cost and CPU share for each audio preset
+#   python audio_analysis.py song.wav   # onsets, beats and tempo found in a WAV file
+
+FFT_SIZE = 2048           # Samples per analysis window (46 ms at 44.1 kHz)
+NUM_BANDS = 6             # One band per LED color zone on the hoodie
+BAND_MIN_HZ = 40.0
+BAND_MAX_HZ = 16000.0
+BAND_FLOOR_DB = -70.0     # Band energy (dB re. a full-scale sine) shown as level 0
+BAND_RANGE_DB = 60.0      # dB from the floor up to level 255
+BAND_FALL = 0.8           # Per-block decay of a band's level, so peaks don't flicker
+
+FLUX_COMPRESSION = 1000.0 # log(1 + C * power): keeps loud bins from swamping the flux
+ONSET_WINDOW = 1.0        # Seconds of flux history behind the adaptive threshold
+ONSET_K = 1.5             # Threshold = mean + ONSET_K * std of that history
+ONSET_MIN_FLUX = 1.0      # Ignore "onsets" in near-silence
+MIN_ONSET_INTERVAL = 0.1  # Seconds; one onset per drum hit
+MIN_BPM = 60
+MAX_BPM = 180
+TEMPO_DECAY = 0.97        # Per-onset decay of the interval histogram, so tempo changes are followed
+TEMPO_MIN_VOTES = 2.0     # Histogram peak needed before beats follow the tempo instead of raw onsets
+TEMPO_PRIOR_BPM = 120     # Most likely tempo; picks 120 over 60 when both fit the onsets
+TEMPO_PRIOR_OCTAVES = 1.0 # Width of that preference (log-Gaussian, in octaves)
+TEMPO_SPREAD = 5          # BPM either side a vote also counts for (onsets are only block-accurate)
+ONSET_MEMORY = 8          # Earlier onsets each new onset is compared with
+PHASE_CORRECTION = 0.3    # Fraction of an onset's timing error the beat clock absorbs
+PHASE_TOLERANCE = 0.2     # Onsets this close to a beat (fraction of the period) steer the clock
+
+LEVEL_SMOOTHING = 10      # Blocks averaged into Brightness
+AGC_PERCENTILE = 0.95     # Share of blocks quieter than the gain level
+AGC_RELEASE_DB_PER_SECOND = 3.0  # How fast the level falls in a quieter passage (it rises 19x faster)
+AGC_HEADROOM_DB = 6.0     # The level shows as Brightness 128; peaks above it use the rest of the range
+AGC_MIN_LEVEL = 0.003     # RMS (about -50 dBFS) below which the AGC adds no more gain, so silence stays dark
+DEFAULT_AUDIO_GAIN = 3    # control_state.json "audio_gain" default; no gain offset (0 is -9 dB, 5 is +6 dB)
+AUDIO_GAIN_STEP_DB = 3.0
+
+AUDIO_PRESETS = {
+    "low_latency": {"label": "Low latency (256 samples)", "blocksize": 256, "latency": "low"},
+    "balanced": {"label": "Balanced (1024 samples)", "blocksize": 1024, "latency": "low"},
+    "power_saving": {"label": "Power saving (2048 samples)", "blocksize": 2048, "latency": "high"},
+}
+DEFAULT_AUDIO_PRESET = "balanced"
+MIN_BLOCKSIZE = 64        # "audio_blocksize" overrides are clamped to this range
+MAX_BLOCKSIZE = 8192
+CALLBACK_WINDOW = 200     # Callbacks behind the interval / jitter / latency figures
+
+class SampleRing:
+    """The latest `size` mono samples in a preallocated circular buffer."""
+
+    def __init__(self, size):
+        self.size = size
+        self.samples = np.zeros(size)
+        self.write_at = 0           # Oldest sample, where the next block goes
+
+    def write(self, block):
+        n = len(block)
+        if n >= self.size:
+            self.samples[:] = block[n - self.size:]
+            self.write_at = 0
+            return
+        first = min(n, self.size - self.write_at)
+        self.samples[self.write_at:self.write_at + first] = block[:first]
+        self.samples[:n - first] = block[first:]
+        self.write_at = (self.write_at + n) % self.size
+
+    def multiply_into(self, weights, out):
+        """out = samples in time order (oldest first) * weights."""
+        tail = self.size - self.write_at
+        np.multiply(self.samples[self.write_at:], weights[:tail], out=out[:tail])
+        np.multiply(self.samples[:self.write_at], weights[tail:], out=out[tail:])
+
+class BandAnalyzer:
+    """Log-spaced band levels (0-255) from a windowed FFT over the latest FFT_SIZE samples."""
+
+    def __init__(self, samplerate, fft_size=FFT_SIZE, num_bands=NUM_BANDS):
+        self.samplerate = samplerate
+        self.fft_size = fft_size
+        self.ring = SampleRing(fft_size)
+        self.window = np.hanning(fft_size)
+        self.frame = np.empty(fft_size)
+        num_bins = fft_size // 2 + 1
+        self.spectrum = np.empty(num_bins, dtype=np.complex128)
+        self.power = np.empty(num_bins)
+        self.scratch = np.empty(num_bins)
+        self.cumulative = np.zeros(num_bins + 1)   # cumulative[k] = power of bins 0..k-1
+        self.cumulative_tail = self.cumulative[1:]
+
+        # Band b covers bins band_start[b]..band_end[b]-1; every band gets at least one bin
+        edges_hz = np.geomspace(BAND_MIN_HZ, min(BAND_MAX_HZ, samplerate / 2), num_bands + 1)
+        edges = np.round(edges_hz * fft_size / samplerate).astype(np.intp)
+        for i in range(1, len(edges)):
+            edges[i] = max(edges[i], edges[i - 1] + 1)
+        edges = np.minimum(edges, num_bins)
+        self.band_start = edges[:-1].copy()
+        self.band_end = edges[1:].copy()
+        self.band_edges_hz = edges * samplerate / fft_size
+        # Band power relative to a full-scale sine through the Hann window. Summing
+        # (not averaging) the bins keeps music, whose energy per octave is roughly
+        # flat, at similar levels in the narrow bass bands and the wide treble ones.
+        self.band_scale = 1.0 / (fft_size / 4) ** 2
+
+        self.start_sums = np.empty(num_bands)
+        self.energy = np.empty(num_bands)
+        self.levels = np.zeros(num_bands)
+        self.bands = np.zeros(num_bands, dtype=np.uint8)   # What send_data reads
+
+        self.blocks = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def process(self, block):
+        """Add one callback block (mono float samples) and update the band levels."""
+        start = time.perf_counter()
+        self.ring.write(block)
+        self.ring.multiply_into(self.window, self.frame)
+        np.fft.rfft(self.frame, out=self.spectrum)
+        np.multiply(self.spectrum.real, self.spectrum.real, out=self.power)
+        np.multiply(self.spectrum.imag, self.spectrum.imag, out=self.scratch)
+        np.add(self.power, self.scratch, out=self.power)
+
+        # Band sums from one cumulative sum: sum(bins a..b-1) = cumulative[b] - cumulative[a]
+        np.add.accumulate(self.power, out=self.cumulative_tail)
+        self.cumulative.take(self.band_end, out=self.energy)
+        self.cumulative.take(self.band_start, out=self.start_sums)
+        np.subtract(self.energy, self.start_sums, out=self.energy)
+        np.multiply(self.energy, self.band_scale, out=self.energy)
+
+        # dB -> 0..255, then fall back slowly instead of dropping straight to the new level
+        np.maximum(self.energy, 1e-12, out=self.energy)
+        np.log10(self.energy, out=self.energy)
+        np.multiply(self.energy, 10.0 * 255 / BAND_RANGE_DB, out=self.energy)
+        np.subtract(self.energy, BAND_FLOOR_DB * 255 / BAND_RANGE_DB, out=self.energy)
+        np.minimum(self.energy, 255.0, out=self.energy)
+        np.maximum(self.energy, 0.0, out=self.energy)
+        np.multiply(self.levels, BAND_FALL, out=self.levels)
+        np.maximum(self.levels, self.energy, out=self.levels)
+        np.copyto(self.bands, self.levels, casting="unsafe")
+
+        elapsed = time.perf_counter() - start
+        self.blocks += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self):
+        return {
+            "bands": self.bands.tolist(),
+            "band_edges_hz": [round(f) for f in self.band_edges_hz.tolist()],
+            "blocks": self.blocks,
+            "avg_us": round(self.total_seconds / max(1, self.blocks) * 1e6, 1),
+            "max_us": round(self.max_seconds * 1e6, 1),
+        }
+
+class BeatTracker:
+    """Onsets, tempo and beat phase from the spectra a BandAnalyzer computes."""
+
+    def __init__(self, analyzer, block_size=1024):
+        self.analyzer = analyzer
+        self.samplerate = analyzer.samplerate
+        num_bins = len(analyzer.power)
+        self.compressed = np.zeros(num_bins)
+        self.previous = np.zeros(num_bins)
+        self.diff = np.empty(num_bins)
+        self.flux_sum = np.zeros(())
+        self.scaled_compression = analyzer.band_scale * FLUX_COMPRESSION
+
+        self.set_block_size(block_size)
+
+        self.tempo_votes = np.zeros(MAX_BPM - MIN_BPM + 1 + 2 * TEMPO_SPREAD)  # Padded for the kernel
+        self.tempo_kernel = 1.0 - np.abs(np.arange(-TEMPO_SPREAD, TEMPO_SPREAD + 1)) / (TEMPO_SPREAD + 1)
+        self.kernel_scratch = np.empty_like(self.tempo_kernel)
+        self.kernel_bpm = np.arange(-TEMPO_SPREAD, TEMPO_SPREAD + 1, dtype=float)
+        bpms = np.arange(MIN_BPM, MAX_BPM + 1)
+        self.tempo_prior = np.exp(-0.5 * (np.log2(bpms / TEMPO_PRIOR_BPM) / TEMPO_PRIOR_OCTAVES) ** 2)
+        self.weighted_votes = np.empty(len(bpms))
+        self.recent_onsets = np.full(ONSET_MEMORY, -1.0)
+        self.recent_at = 0
+
+        self.samples_seen = 0
+        self.time = 0.0
+        self.flux = 0.0
+        self.above_threshold = False
+        self.onsets = 0
+        self.last_onset = -1.0
+        self.bpm = None
+        self.beats = 0
+        self.last_beat = 0.0
+        self.next_beat = None
+        self.phase = 1.0
+
+    def set_block_size(self, block_size):
+        """Size the flux history (the adaptive threshold's last ONSET_WINDOW seconds) for this block size."""
+        self.history = np.zeros(max(2, int(ONSET_WINDOW * self.samplerate / max(1, block_size))))
+        self.history_at = 0
+        self.history_sum = 0.0
+        self.history_sq_sum = 0.0
+
+    def process(self, block_size):
+        """Call right after analyzer.process() with the same block's length."""
+        self.samples_seen += block_size
+        self.time = now = self.samples_seen / self.samplerate
+
+        # Spectral flux: summed increase of log-compressed power since the last block
+        np.multiply(self.analyzer.power, self.scaled_compression, out=self.compressed)
+        np.log1p(self.compressed, out=self.compressed)
+        np.subtract(self.compressed, self.previous, out=self.diff)
+        np.maximum(self.diff, 0.0, out=self.diff)
+        np.add.reduce(self.diff, out=self.flux_sum)
+        self.compressed, self.previous = self.previous, self.compressed
+        flux = self.flux = float(self.flux_sum)
+
+        mean = self.history_sum / len(self.history)
+        std = max(0.0, self.history_sq_sum / len(self.history) - mean * mean) ** 0.5
+        above = flux > mean + ONSET_K * std and flux > ONSET_MIN_FLUX
+        if above and not self.above_threshold and now - self.last_onset >= MIN_ONSET_INTERVAL:
+            self.onset(now)
+        self.above_threshold = above
+
+        old = self.history[self.history_at]
+        self.history[self.history_at] = flux
+        self.history_at = (self.history_at + 1) % len(self.history)
+        self.history_sum += flux - old
+        self.history_sq_sum += flux * flux - old * old
+
+        self.advance_beat_clock(now)
+
+    def onset(self, now):
+        self.onsets += 1
+        self.last_onset = now
+
+        # Vote for the tempo each interval to a recent onset implies (folded into MIN..MAX_BPM).
+        # The k-th previous onset counts 1/k, so the beat itself outweighs its multiples.
+        np.multiply(self.tempo_votes, TEMPO_DECAY, out=self.tempo_votes)
+        for k in range(1, ONSET_MEMORY + 1):
+            previous = self.recent_onsets[(self.recent_at - k) % ONSET_MEMORY]
+            if previous < 0:
+                break
+            interval = now - previous
+            while interval < 60.0 / MAX_BPM:
+                interval *= 2
+            while interval > 60.0 / MIN_BPM:
+                interval /= 2
+            bpm_bin = int(round(60.0 / interval)) - MIN_BPM
+            if 0 <= bpm_bin <= MAX_BPM - MIN_BPM:
+                votes = self.tempo_votes[bpm_bin:bpm_bin + 2 * TEMPO_SPREAD + 1]
+                np.multiply(self.tempo_kernel, 1.0 / k, out=self.kernel_scratch)
+                np.add(votes, self.kernel_scratch, out=votes)
+        self.recent_onsets[self.recent_at] = now
+        self.recent_at = (self.recent_at + 1) % ONSET_MEMORY
+
+        # Most likely tempo, refined to the centroid of the votes around it
+        np.multiply(self.tempo_votes[TEMPO_SPREAD:-TEMPO_SPREAD], self.tempo_prior, out=self.weighted_votes)
+        best = int(self.weighted_votes.argmax())
+        if self.tempo_votes[TEMPO_SPREAD + best] >= TEMPO_MIN_VOTES:
+            around = self.tempo_votes[best:best + 2 * TEMPO_SPREAD + 1]
+            self.bpm = MIN_BPM + best + float(np.dot(around, self.kernel_bpm)) / float(around.sum())
+
+        if self.bpm is None or self.next_beat is None:
+            # No tempo yet (or just found): every onset is a beat
+            self.beat(now)
+            return
+        period = 60.0 / self.bpm
+        error = now - self.next_beat
+        if abs(error) > abs(now - self.last_beat):
+            error = now - self.last_beat
+        if abs(error) <= PHASE_TOLERANCE * period:
+            self.next_beat += error * PHASE_CORRECTION
+        elif now - self.last_beat > 2 * period:
+            self.beat(now)   # Lost the beat (break in the music): restart on this onset
+
+    def beat(self, at):
+        self.beats += 1
+        self.last_beat = at
+        self.next_beat = at + 60.0 / self.bpm if self.bpm else None
+
+    def advance_beat_clock(self, now):
+        if self.next_beat is not None and now >= self.next_beat:
+            self.beat(self.next_beat)
+        period = 60.0 / self.bpm if self.bpm else 0.5
+        self.phase = min(1.0, (now - self.last_beat) / period)
+
+    def pulse(self):
+        """0-255, 255 on the beat and fading out until the next one."""
+        return int(255 * (1.0 - self.phase) ** 2) if self.beats else 0
+
+    def stats(self):
+        return {
+            "bpm": None if self.bpm is None else round(self.bpm, 1),
+            "onsets": self.onsets,
+            "beats": self.beats,
+            "phase": round(self.phase, 2),
+            "flux": round(self.flux, 2),
+        }
+
+class PublishedValues:
+    """Single-writer, lock-free slot (a seqlock): the writer brackets each update, readers retry on a torn read."""
+
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        self.sequence = 0        # Odd while the writer is updating `values`
+
+    def begin_write(self):
+        self.sequence += 1
+
+    def end_write(self):
+        self.sequence += 1
+
+    def read(self):
+        while True:
+            before = self.sequence
+            if before % 2 == 0:
+                values = self.values.copy()
+                if self.sequence == before:
+                    return values
+            time.sleep(0)
+
+class AutomaticGain:
+    """Gain level that tracks a high percentile of the block RMS and maps RMS to 0-255 in O(1)."""
+
+    def __init__(self):
+        self.level_db = 20 * math.log10(AGC_MIN_LEVEL)
+        self.level = AGC_MIN_LEVEL
+        self.rms = 0.0
+        self.audio_gain = DEFAULT_AUDIO_GAIN
+        self.gain = 1.0
+        self.scale = 255 * 10 ** (-AGC_HEADROOM_DB / 20)
+
+    def set_gain(self, audio_gain):
+        """Web UI slider: each step away from DEFAULT_AUDIO_GAIN is AUDIO_GAIN_STEP_DB of gain."""
+        if audio_gain != self.audio_gain:
+            self.audio_gain = audio_gain
+            self.gain = 10 ** ((audio_gain - DEFAULT_AUDIO_GAIN) * AUDIO_GAIN_STEP_DB / 20)
+
+    def track(self, block_rms, seconds):
+        """Move the level toward the AGC_PERCENTILE of the raw block RMS (quantile tracking in dB)."""
+        step = AGC_RELEASE_DB_PER_SECOND * seconds / (1.0 - AGC_PERCENTILE)
+        if block_rms > self.level:
+            self.level_db += step * AGC_PERCENTILE
+        else:
+            self.level_db -= step * (1.0 - AGC_PERCENTILE)
+        self.level = 10 ** (self.level_db / 20)
+        if self.level < AGC_MIN_LEVEL:
+            self.level = AGC_MIN_LEVEL
+            self.level_db = 20 * math.log10(AGC_MIN_LEVEL)
+        self.rms = block_rms
+
+    def brightness(self, rms):
+        """Brightness (0-255, float) for a (smoothed) RMS at the current level."""
+        return min(255.0, rms / self.level * self.gain * self.scale)
+
+    def stats(self):
+        def dbfs(value):
+            return round(20 * math.log10(max(value, 1e-9)), 1)
+
+        return {
+            "level_dbfs": dbfs(self.level),
+            "rms_dbfs": dbfs(self.rms),
+            "gain_db": round(-dbfs(self.level) - AGC_HEADROOM_DB + 20 * math.log10(self.gain), 1),
+            "audio_gain": self.audio_gain,
+        }
+
+def audio_stream_settings(control):
+    """(preset, blocksize, latency) for sd.InputStream from control_state.json; latency is "low", "high" or seconds.
+
+    Overrides that aren't usable fall back to the preset's value.
+    """
+    preset = control.get("audio_preset", DEFAULT_AUDIO_PRESET)
+    if preset not in AUDIO_PRESETS:
+        preset = DEFAULT_AUDIO_PRESET
+    try:
+        blocksize = int(control.get("audio_blocksize", AUDIO_PRESETS[preset]["blocksize"]))
+        blocksize = min(max(blocksize, MIN_BLOCKSIZE), MAX_BLOCKSIZE)
+    except (TypeError, ValueError):
+        blocksize = AUDIO_PRESETS[preset]["blocksize"]
+    latency = control.get("audio_latency", AUDIO_PRESETS[preset]["latency"])
+    if latency not in ("low", "high"):
+        try:
+            latency = float(latency)
+        except (TypeError, ValueError):
+            latency = None
+        if latency is None or not latency > 0:
+            latency = AUDIO_PRESETS[preset]["latency"]
+    return preset, blocksize, latency
+
+class CallbackTimer:
+    """Interval, jitter, input latency and cost of the last CALLBACK_WINDOW audio callbacks."""
+
+    def __init__(self, window=CALLBACK_WINDOW):
+        self.intervals = np.full(window, np.nan)
+        self.input_latencies = np.full(window, np.nan)
+        self.costs = np.full(window, np.nan)
+        self.reset()
+
+    def reset(self):
+        self.intervals.fill(np.nan)
+        self.input_latencies.fill(np.nan)
+        self.costs.fill(np.nan)
+        self.at = 0
+        self.callbacks = 0
+        self.last_start = None
+
+    def record(self, started, time_info=None):
+        """Call at the end of the callback with the perf_counter() taken at its start and PortAudio's time info."""
+        i = self.at
+        self.costs[i] = time.perf_counter() - started
+        self.intervals[i] = np.nan if self.last_start is None else started - self.last_start
+        self.last_start = started
+        # Some host APIs report no stream times (all zero); leave the latency unmeasured then
+        adc_time = time_info.inputBufferAdcTime if time_info is not None else 0.0
+        self.input_latencies[i] = time_info.currentTime - adc_time if adc_time else np.nan
+        self.at = (i + 1) % len(self.costs)
+        self.callbacks += 1
+
+    def stats(self):
+        def ms(values, reduce):
+            values = values[~np.isnan(values)]
+            return round(float(reduce(values)) * 1000, 2) if len(values) else None
+
+        interval_ms = ms(self.intervals, np.mean)
+        cost_ms = ms(self.costs, np.mean)
+        return {
+            "callbacks": self.callbacks,
+            "interval_ms": interval_ms,
+            "jitter_ms": ms(self.intervals, np.std),
+            "max_interval_ms": ms(self.intervals, np.max),
+            "input_latency_ms": ms(self.input_latencies, np.mean),
+            "callback_us": None if cost_ms is None else round(cost_ms * 1000, 1),
+            "cpu_percent": round(cost_ms / interval_ms * 100, 2) if cost_ms and interval_ms else None,
+        }
+
+class AudioPipeline:
+    """The audio callback: Brightness, band levels and beats from each block, with no per-block arrays."""
+
+    def __init__(self, samplerate, block_size=1024):
+        self.samplerate = samplerate
+        self.agc = AutomaticGain()
+        self.analyzer = BandAnalyzer(samplerate)
+        self.beats = BeatTracker(self.analyzer, block_size)
+        self.timer = CallbackTimer()
+        self.recent_levels = np.zeros(LEVEL_SMOOTHING)   # Block RMS, smoothed into Brightness
+        self.recent_at = 0
+        self.level_sum = 0.0
+        self.published = PublishedValues(1 + len(self.analyzer.bands))
+        self.published_bands = self.published.values[1:]
+
+    def set_block_size(self, block_size):
+        """Call while no stream is running, before opening one with a new block size (0: PortAudio picks)."""
+        self.beats.set_block_size(block_size or 1024)
+        self.timer.reset()
+
+    def process(self, indata, frames, time_info=None):
+        started = time.perf_counter()
+        block = indata[:, 0]
+        rms = (float(np.dot(block, block)) / max(1, frames)) ** 0.5
+        self.level_sum += rms - self.recent_levels[self.recent_at]
+        self.recent_levels[self.recent_at] = rms
+        self.recent_at = (self.recent_at + 1) % LEVEL_SMOOTHING
+        self.agc.track(rms, frames / self.samplerate)
+        brightness = self.agc.brightness(max(0.0, self.level_sum) / LEVEL_SMOOTHING)
+
+        self.analyzer.process(block)
+        self.beats.process(frames)
+
+        self.published.begin_write()
+        self.published.values[0] = brightness
+        np.copyto(self.published_bands, self.analyzer.bands)
+        self.published.end_write()
+        self.timer.record(started, time_info)
+
+    def read(self):
+        """(brightness 0-255, band levels) as last published; safe from any thread."""
+        values = self.published.read()
+        return int(values[0]), values[1:].astype(int).tolist()
+
+def read_wav(path):
+    """Mono float samples in -1..1 and the sample rate of an 8/16/32-bit PCM WAV file."""
+    with wave.open(path, "rb") as f:
+        samplerate, channels, width = f.getframerate(), f.getnchannels(), f.getsampwidth()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    else:
+        raise ValueError(f"{width * 8}-bit WAV files aren't supported")
+    return samples.reshape(-1, channels).mean(axis=1), samplerate
+
+def analyze_wav(path, block_size=1024):
+    """Run a WAV file through AudioPipeline in callback-sized blocks; prints the beats and Brightness it produced."""
+    samples, samplerate = read_wav(path)
+    pipeline = AudioPipeline(samplerate, block_size)
+    tracker = pipeline.beats
+    onset_times, beat_times, brightness = [], [], []
+    for at in range(0, len(samples) - block_size + 1, block_size):
+        onsets, beats = tracker.onsets, tracker.beats
+        pipeline.process(samples[at:at + block_size, None], block_size)
+        brightness.append(pipeline.read()[0])
+        if tracker.onsets != onsets:
+            onset_times.append(round(tracker.last_onset, 3))
+        if tracker.beats != beats:
+            beat_times.append(round(tracker.last_beat, 3))
+    print(f"🎵 {path}: {len(samples) / samplerate:.1f} s at {samplerate} Hz")
+    print(f"Tempo: {tracker.stats()['bpm']} BPM, {len(onset_times)} onsets, {len(beat_times)} beats")
+    print(f"Onsets (s): {onset_times}")
+    print(f"Beats (s): {beat_times}")
+    print(f"Brightness p10/p50/p90: {np.percentile(brightness, [10, 50, 90]).astype(int).tolist()}, AGC {pipeline.agc.stats()}")
+    print(f"⏱️ {pipeline.analyzer.stats()['avg_us']} µs per block for the band analyzer (beat tracking adds to it)")
+    return pipeline
+
+def benchmark(samplerate=44100, block_size=1024, seconds=5.0):
+    """Feed a bass + treble test signal through BandAnalyzer and BeatTracker and print the per-block cost."""
+    analyzer = BandAnalyzer(samplerate)
+    tracker = BeatTracker(analyzer, block_size)
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    signal = 0.5 * np.sin(2 * np.pi * 60 * t) + 0.1 * np.sin(2 * np.pi * 8000 * t)
+    signal = signal.astype(np.float32)
+    tracker_seconds = 0.0
+    for at in range(0, len(signal) - block_size + 1, block_size):
+        analyzer.process(signal[at:at + block_size])
+        start = time.perf_counter()
+        tracker.process(block_size)
+        tracker_seconds += time.perf_counter() - start
+    stats = analyzer.stats()
+    print(f"⏱️ {stats['blocks']} blocks of {block_size} samples: {stats['avg_us']} µs avg, {stats['max_us']} µs max "
+          f"+ {tracker_seconds / stats['blocks'] * 1e6:.1f} µs avg beat tracking")
+    print(f"🎨 Bands {stats['band_edges_hz']} Hz -> levels {stats['bands']}")
+
+def allocation_benchmark(block_sizes=(256, 1024, 4096), calls=200, max_intensity=0.3):
+    """Peak bytes allocated during one callback (tracemalloc), for the old deque/RMS callback and AudioPipeline."""
+    smoothing = deque(maxlen=LEVEL_SMOOTHING)
+
+    def old_callback(indata, frames):
+        # The callback backend.py used before AudioPipeline
+        intensity = np.sqrt(np.mean(indata**2))
+        smoothing.append(min(255, max(0, int((intensity / max_intensity) * 255))))
+        return int(np.mean(smoothing))
+
+    rng = np.random.default_rng(0)
+    for block_size in block_sizes:
+        pipeline = AudioPipeline(44100, block_size)
+        blocks = [(rng.standard_normal((block_size, 1)) * 0.1).astype(np.float32) for _ in range(8)]
+        results = []
+        for callback in (old_callback, pipeline.process):
+            for i in range(20):
+                callback(blocks[i % len(blocks)], block_size)   # Warm up caches and lazy imports
+            tracemalloc.start()
+            worst = 0
+            for i in range(calls):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                callback(blocks[i % len(blocks)], block_size)
+                worst = max(worst, tracemalloc.get_traced_memory()[1] - before)
+            tracemalloc.stop()
+            results.append(worst)
+        print(f"{block_size:>5} samples: old callback peaks at {results[0]:>6} B, AudioPipeline at {results[1]:>5} B per call")
+    print("AudioPipeline's remainder is NumPy/Python call overhead, the same at every block size; "
+          "the old callback's grows with the block (indata**2, deque -> array).")
+
+def preset_benchmark(samplerate=44100, seconds=10.0):
+    """AudioPipeline cost per callback and as a share of real time, for each preset's block size."""
+    rng = np.random.default_rng(0)
+    signal = (rng.standard_normal((int(samplerate * seconds), 1)) * 0.1).astype(np.float32)
+    for name, preset in AUDIO_PRESETS.items():
+        block_size = preset["blocksize"]
+        pipeline = AudioPipeline(samplerate, block_size)
+        calls = 0
+        start = time.perf_counter()
+        for at in range(0, len(signal) - block_size + 1, block_size):
+            pipeline.process(signal[at:at + block_size], block_size)
+            calls += 1
+        elapsed = time.perf_counter() - start
+        audio_seconds = calls * block_size / samplerate
+        print(f"{preset['label']:<28} {calls / audio_seconds:6.1f} callbacks/s, "
+              f"{elapsed / calls * 1e6:6.1f} µs each, {elapsed / audio_seconds * 100:5.2f}% of one core")
+
+if __name__ == "__main__":
+    if "--presets" in sys.argv:
+        preset_benchmark()
+    elif "--alloc" in sys.argv:
+        allocation_benchmark()
+    elif len(sys.argv) > 1:
+        analyze_wav(sys.argv[1])
+    else:
+        benchmark()
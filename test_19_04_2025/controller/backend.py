@@ -642,22 +642,18 @@ if __name__ == "__main__":
 import time
 import json
 import threading
-import serial
-import serial.tools.list_ports
 import numpy as np
 import sounddevice as sd
-import mss
-import cv2
 from pynput import mouse
-from collections import deque
-from queue import Queue, Empty
-from PIL import Image, ImageEnhance
-from scipy.spatial import distance
 import os
-
-# Track how many messages have been sent
-flush_counter = 0
-latest_json_data = None
+from screen_sampling import get_sampling_plan, grid_colors_from_frame
+from capture_worker import CaptureWorker
+from change_detector import ChangeDetector
+from frame_pacing import FramePacer, FrameRateGovernor
+from color_lut import DEFAULT_SATURATION, POINTS_SATURATION, apply_color_lut, get_color_lut_for
+from serial_protocol import DEFAULT_PROTOCOL
+from device_fanout import DeviceFanout
+from audio_analysis import AUDIO_PRESETS, DEFAULT_AUDIO_GAIN, AudioPipeline, audio_stream_settings
 
 
 CONTROL_JSON_PATH = os.path.join(os.path.dirname(__file__), "control_state.json")
@@ -681,6 +677,15 @@ def read_control_state():
             "lights_enabled": True
         }
 
+def read_audio_stream_settings():
+    """audio_stream_settings() for control_state.json, or None if it can't be read right now."""
+    try:
+        with open(CONTROL_JSON_PATH, "r") as f:
+            return audio_stream_settings(json.load(f))
+    except Exception as e:
+        print(f"⚠️ Failed to read control_state.json: {e}")
+        return None
+
 def was_shutdown_requested():
     try:
         with open(SHUTDOWN_FLAG_PATH, "r") as f:
@@ -691,32 +696,23 @@ def was_shutdown_requested():
 
 # ** Control Variables**
 stop_event = threading.Event()
-serial_queue = Queue()
 SERIAL_WRITE_DELAY = 0.1  # Adjust sending rate
 
 # ** Find Available Serial Port**
 # ** Get Serial Port from selected_port.json**
-def get_selected_serial_port():
+def get_selected_devices():
+    """Device list from selected_port.json: a "devices" list of {"port"/"udp"/"websocket", "layout"}, or a single device."""
     try:
         with open(os.path.join(os.path.dirname(__file__), "selected_port.json"), "r") as f:
             data = json.load(f)
-            return data.get("port", None)
     except Exception as e:
         print(f" Could not read selected_port.json: {e}")
-        return None
-
-SERIAL_PORT = get_selected_serial_port()
-
-ser = None
-if SERIAL_PORT:
-    try:
-        ser = serial.Serial(SERIAL_PORT, 115200, timeout=1)
-        ser.flush()  # Clear previous data
-        time.sleep(2)
-        print(f" Connected to ESP32 on {SERIAL_PORT}")
-    except serial.SerialException:
-        print(f" Failed to connect to {SERIAL_PORT}.")
-        ser = None
+        return []
+    if "devices" in data:
+        return data["devices"]
+    if data.get("udp") or data.get("websocket"):
+        return [data]
+    return [{"port": data["port"]}] if data.get("port") else []
 
 # Store movement data
 positions = []
@@ -814,17 +810,54 @@ mouse_listener.start()
 # ** Audio Processing**
 DEVICE_INDEX = None
 SAMPLERATE = 44100
-MAX_INTENSITY = 0.3
-intensity_buffer = deque(maxlen=10)
-audio_brightness = 0
+# Brightness (auto gain), bass..treble band levels and beats; preallocated, read via audio.read()
+audio = AudioPipeline(SAMPLERATE)
+audio_stream = None
+audio_settings = None      # (preset, blocksize, latency) the stream was opened with
+audio_cpu_by_preset = {}   # Last measured callback CPU share per preset, for the web UI
 
 def get_audio_intensity(indata, frames, time, status):
-    """Process audio intensity and update brightness."""
-    global audio_brightness
-    intensity = np.sqrt(np.mean(indata**2))
-    brightness = min(255, max(0, int((intensity / MAX_INTENSITY) * 255)))
-    intensity_buffer.append(brightness)
-    audio_brightness = int(np.mean(intensity_buffer))
+    """Process audio intensity and update brightness, band levels and beats."""
+    audio.process(indata, frames, time)
+
+def open_audio_stream(settings):
+    """Start the input stream with the block size and latency from control_state.json."""
+    global audio_stream, audio_settings
+    preset, blocksize, latency = settings
+    audio.set_block_size(blocksize)
+    try:
+        stream = sd.InputStream(device=DEVICE_INDEX, channels=1, samplerate=SAMPLERATE, blocksize=blocksize,
+                                latency=latency, callback=get_audio_intensity)
+    except Exception as e:
+        print(f"⚠️ Audio stream with {blocksize} samples / latency {latency} failed ({e}), using PortAudio defaults")
+        audio.set_block_size(0)
+        stream = sd.InputStream(device=DEVICE_INDEX, channels=1, samplerate=SAMPLERATE, callback=get_audio_intensity)
+    stream.start()
+    audio_stream, audio_settings = stream, settings
+    print(f"🎵 Audio: {preset}, {blocksize} samples per block, {stream.latency * 1000:.0f} ms input latency reported")
+
+def close_audio_stream():
+    global audio_stream
+    if audio_stream is not None:
+        audio_stream.close()
+        audio_stream = None
+
+def audio_stream_stats():
+    if audio_settings is None:
+        return None
+    preset, blocksize, latency = audio_settings
+    stats = audio.timer.stats()
+    if stats["cpu_percent"] is not None:
+        audio_cpu_by_preset[preset] = stats["cpu_percent"]
+    stats.update({
+        "preset": preset,
+        "blocksize": audio_stream.blocksize if audio_stream else blocksize,
+        "latency": latency,
+        "reported_latency_ms": round(audio_stream.latency * 1000, 1) if audio_stream else None,
+        "cpu_percent_by_preset": dict(audio_cpu_by_preset),
+        "presets": {name: p["label"] for name, p in AUDIO_PRESETS.items()},
+    })
+    return stats
 
 # ** Screen Color Processing**
 GRID_ROWS, GRID_COLS = 10, 10
@@ -832,45 +865,98 @@ BRIGHTNESS_THRESHOLD = 60
 NUM_DISTINCT_COLORS = 6
 COLOR_SIMILARITY_THRESHOLD = 80
 
-def get_screen_grid_colors():
-    """Load saved points and sample LED colors from screen."""
-    points_path = os.path.join(os.path.dirname(__file__), "led_points.json")
-    try:
-        with open(points_path, "r") as f:
-            points = json.load(f)
-            points = [(pt["x"], pt["y"]) for pt in points]
-    except Exception as e:
-        print(f"❌ Could not load LED points from JSON: {e}")
+LED_POINTS_PATH = os.path.join(os.path.dirname(__file__), "led_points.json")
+CAPTURE_FPS = 30  # Screen grabs per second in the capture worker
+
+# One long-lived capture thread instead of a fresh mss.mss() per frame
+capture_worker = CaptureWorker(fps=CAPTURE_FPS)
+last_screen_sample = None
+last_capture_time = None  # perf_counter() of the grab last_screen_sample came from
+
+# Skips enhance/serialize/write while the screen and the other fields are static
+screen_detector = ChangeDetector()
+
+# Adapts the send_data rate (and the capture rate) to on-screen motion and CPU cost
+frame_governor = FrameRateGovernor(start_fps=1.0 / SERIAL_WRITE_DELAY)
+send_pacer = FramePacer(frame_governor.fps)
+
+# Every device from selected_port.json gets its own serial writer, connection manager
+# (reconnects after unplug / write errors) and latency tracker; send_data hands payloads to all
+devices = DeviceFanout()
+DEVICE_SYNC_INTERVAL = 5.0  # Seconds between selected_port.json re-reads
+DISCONNECTED_FPS = 2.0  # send_data/capture rate while no device is connected
+
+STATS_JSON_PATH = os.path.join(os.path.dirname(__file__), "pipeline_stats.json")
+STATS_WRITE_INTERVAL = 1.0  # Seconds between pipeline_stats.json updates
+
+def pick_bright_grid_colors(cell_colors):
+    """Grid fallback: keep the first cells that are bright enough."""
+    grid_colors = []
+    for r, g, b in cell_colors.tolist():
+        brightness = np.sqrt(0.299 * (r**2) + 0.587 * (g**2) + 0.114 * (b**2))
+        if brightness > BRIGHTNESS_THRESHOLD:
+            grid_colors.append({"R": r, "G": g, "B": b})
+
+    return grid_colors[:NUM_DISTINCT_COLORS]
+
+def sample_screen_colors():
+    """Raw (rgb, is_grid) samples from the capture worker's latest frame, before color correction."""
+    global last_screen_sample, last_capture_time
+    if not capture_worker.is_alive():
+        return last_screen_sample  # mss failed to open (see capture.start_error) or the worker stopped
+    if not capture_worker.wait_ready():
+        return last_screen_sample
+
+    plan = None
+    if os.path.exists(LED_POINTS_PATH):
+        try:
+            plan = get_sampling_plan(LED_POINTS_PATH, capture_worker)
+        except Exception as e:
+            print(f"❌ Could not load LED points from JSON: {e}")
+            return None
+    region = plan.bbox if plan else None
+    capture_worker.set_region(region)
+
+    with capture_worker.latest_frame() as frame:
+        expected = region or capture_worker.monitors[capture_worker.monitor_index]
+        if frame is None or any(frame.region[k] != expected[k] for k in frame.region):
+            return last_screen_sample  # Worker hasn't grabbed the new region yet
+
+        if plan is None:
+            # No LED points selected yet: average a screen grid straight from the captured buffer
+            last_screen_sample = (grid_colors_from_frame(frame.pixels, GRID_ROWS, GRID_COLS), True)
+        else:
+            last_screen_sample = (plan.sample_frame(frame.pixels), False)
+        last_capture_time = frame.timestamp
+
+    return last_screen_sample
+
+def screen_colors_to_payload(sample, control):
+    """Color-correct raw samples (on the reduced colors only) and turn them into LEDColors dicts."""
+    rgb, is_grid = sample
+    lut = get_color_lut_for(control, DEFAULT_SATURATION if is_grid else POINTS_SATURATION)
+    rgb = apply_color_lut(lut, rgb)
+    if is_grid:
+        return pick_bright_grid_colors(rgb)
+    return [{"R": r, "G": g, "B": b} for r, g, b in rgb.tolist()]
+
+def get_screen_grid_colors(control=None):
+    """Sample LED colors from the capture worker's latest frame using the cached sampling plan."""
+    sample = sample_screen_colors()
+    if sample is None:
         return []
+    return screen_colors_to_payload(sample, control or {})
 
-    return sample_colors_at(points)
-
-def sample_colors_at(points, window=3):
-    """Sample average RGB values from small screen regions around each point."""
-    half = window // 2
-    colors = []
-    with mss.mss() as sct:
-        for x, y in points:
-            region = {
-                "left": int(x) - half,
-                "top": int(y) - half,
-                "width": window,
-                "height": window
-            }
-            try:
-                img = sct.grab(region)
-                arr = np.frombuffer(img.rgb, dtype=np.uint8)
-                arr = arr.reshape((window, window, 3))
-                r, g, b = (int(v) for v in arr.mean(axis=(0, 1)))
-                colors.append({"R": r, "G": g, "B": b})
-            except Exception as e:
-                print(f"⚠️ Sampling failed at ({x}, {y}): {e}")
-                colors.append({"R": 0, "G": 0, "B": 0})  # fallback
-    return colors
+def governed_sleep(raw_colors, brightness):
+    """Feed the governor this frame's samples, then wait for the next deadline at its rate."""
+    frame_governor.update(raw_colors, brightness)
+    fps = frame_governor.fps if devices.connected else min(frame_governor.fps, DISCONNECTED_FPS)
+    capture_worker.set_fps(fps)
+    send_pacer.set_fps(fps)
+    send_pacer.wait(stop_event)
 
 def send_data():
-    """Send merged JSON data for screen, audio, and mouse updates at a fixed rate."""
-    global flush_counter
+    """Send merged JSON data for screen, audio, and mouse updates at the governor's rate."""
     while not stop_event.is_set():
         # Read control state
         try:
@@ -881,10 +967,14 @@ def send_data():
             control = {}
 
         json_data = {}
+        screen_sample = None
+        audio.agc.set_gain(control.get("audio_gain", DEFAULT_AUDIO_GAIN))
+        audio_brightness, audio_bands = audio.read()
 
         if control.get("lights_enabled", True):
             if control.get("screen", True):
-                json_data["LEDColors"] = get_screen_grid_colors()
+                screen_sample = sample_screen_colors()
+                json_data["LEDColors"] = []  # Filled in below, only if the frame is sent
             if control.get("audio", True):
                 json_data["Brightness"] = audio_brightness
             json_data["lights_enabled"] = True
@@ -893,6 +983,7 @@ def send_data():
 
         if control.get("audio", True):
             json_data["Brightness"] = audio_brightness
+            json_data["Bands"] = audio_bands
 
         if control.get("mouse", True):
             json_data["MouseSpeed"] = calculate_scaled_speed()
@@ -910,57 +1001,98 @@ def send_data():
                 
         json_data["vibration"] = control.get("vibration", False)
         json_data["sync_with_audio"] = control.get("sync_with_audio", False)
-
-        # Send to ESP32
-        json_str = json.dumps(json_data)
-        global latest_json_data
-        latest_json_data = json_str
-        # Increment counter and flush every 1000 messages
-        flush_counter += 1
-        if flush_counter >= 1000:
-            if ser:
-                ser.flush()
-                print("🔄 Serial buffer flushed.")
-            flush_counter = 0
-        print(f" Sending: {json_str}")
-        time.sleep(SERIAL_WRITE_DELAY)
-
-def serial_write_loop():
-    """Continuously send latest data to ESP32 at a controlled rate."""
-    global latest_json_data
-    while not stop_event.is_set():
-        if latest_json_data and ser:
-            try:
-                ser.write(f"{latest_json_data}\n".encode())
-                print(f" Data sent: {latest_json_data}")
-                time.sleep(SERIAL_WRITE_DELAY)
-            except serial.SerialTimeoutException:
-                print(" Serial write timeout, skipping data")
-        else:
-            time.sleep(0.01)  # avoid busy loop
+        if json_data["sync_with_audio"] and "Brightness" in json_data:
+            # Pulse on every beat; the device drives the vibration motors from Brightness too
+            json_data["Brightness"] = audio_brightness * audio.beats.pulse() // 255
+
+        # 🔹 Static screen: skip the rest unless something moved or a keepalive is due
+        extras = {k: v for k, v in json_data.items() if k != "LEDColors"}
+        if "LEDColors" in json_data:
+            # The LEDs show screen colors, so the audio levels only matter while
+            # Brightness drives the vibration motors (vibration + sync_with_audio)
+            extras.pop("Bands", None)
+            if not (json_data["vibration"] and json_data["sync_with_audio"]):
+                extras.pop("Brightness", None)
+        raw_colors = screen_sample[0] if screen_sample else None
+        if not screen_detector.should_send(raw_colors, extras):
+            governed_sleep(raw_colors, json_data.get("Brightness"))
+            continue
+        work_start = time.thread_time()
+
+        if "LEDColors" in json_data and screen_sample:
+            json_data["LEDColors"] = screen_colors_to_payload(screen_sample, control)
+
+        # Send to ESP32 (binary keyframe/delta, or a JSON line for old firmware)
+        captured_at = last_capture_time if screen_sample else None
+        devices.submit(json_data, control.get("serial_protocol", DEFAULT_PROTOCOL), captured_at,
+                       tag_frames=control.get("latency_tracking", False))
+        print(f" Sending: {json_data}")
+        screen_detector.record_work(time.thread_time() - work_start)
+        governed_sleep(raw_colors, json_data.get("Brightness"))
+
+def write_pipeline_stats():
+    """Publish pipeline counters to pipeline_stats.json for the web UI."""
+    stats = {
+        "updated": time.time(),
+        "static_screen": screen_detector.stats(),
+        "governor": frame_governor.stats(),
+        "send_pacing": send_pacer.stats(),
+        "devices": devices.stats(),
+        "audio_bands": audio.analyzer.stats(),
+        "audio_beats": audio.beats.stats(),
+        "audio_agc": audio.agc.stats(),
+        "audio_stream": audio_stream_stats(),
+        "capture": {
+            "frames_captured": capture_worker.frames_captured,
+            "capture_errors": capture_worker.capture_errors,
+            "start_error": capture_worker.start_error,
+            "pacing": capture_worker.pacer.stats(),
+        },
+    }
+    try:
+        with open(STATS_JSON_PATH, "w") as f:
+            json.dump(stats, f, indent=2)
+    except Exception as e:
+        print(f"⚠️ Failed to write pipeline_stats.json: {e}")
 
 # **🔹 Run All Features in Parallel**
 def main_loop():
     """Main loop to process audio and start screen, mouse, and serial threads."""
     try:
-        with sd.InputStream(device=DEVICE_INDEX, channels=1, samplerate=SAMPLERATE, callback=get_audio_intensity):
-            threading.Thread(target=send_data, daemon=True).start()
-            threading.Thread(target=serial_write_loop, daemon=True).start()
-
-            while not stop_event.is_set():
-                if was_shutdown_requested():
-                    print(" Shutdown requested via shutdown_flag.json")
-                    stop_event.set()
-                    break
-                time.sleep(0.05)
+        capture_worker.start()
+        devices.sync(get_selected_devices())
+        open_audio_stream(read_audio_stream_settings() or audio_stream_settings({}))
+        threading.Thread(target=send_data, daemon=True).start()
+
+        last_stats_write = 0.0
+        last_device_sync = time.monotonic()
+        while not stop_event.is_set():
+            if was_shutdown_requested():
+                print(" Shutdown requested via shutdown_flag.json")
+                stop_event.set()
+                break
+            if time.monotonic() - last_stats_write >= STATS_WRITE_INTERVAL:
+                write_pipeline_stats()
+                last_stats_write = time.monotonic()
+                # Reopen the audio stream when the preset / block size / latency was changed
+                # (a failed read, e.g. while web.py rewrites the file, changes nothing)
+                settings = read_audio_stream_settings()
+                if settings is not None and settings != audio_settings:
+                    close_audio_stream()
+                    open_audio_stream(settings)
+            if time.monotonic() - last_device_sync >= DEVICE_SYNC_INTERVAL:
+                devices.sync(get_selected_devices())
+                last_device_sync = time.monotonic()
+            time.sleep(0.05)
 
     except KeyboardInterrupt:
         print("\n Exiting program... (Ctrl + C detected)")
         stop_event.set()
 
     finally:
-        if ser:
-            ser.close()
+        close_audio_stream()
+        capture_worker.stop()
+        devices.stop()
         time.sleep(1)
         exit(0)
     
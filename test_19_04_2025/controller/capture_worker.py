@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+import mss
+import numpy as np
+from frame_pacing import FramePacer
+
+# ** Capture Worker**
+# One long-lived thread owns the mss instance (mss handles are per-thread),
+# grabs at a fixed rate into a preallocated double buffer and publishes a
+# monotonically numbered "latest frame". Consumers never wait for a capture:
+# they read whatever frame is newest, and frames nobody picked up are simply
+# overwritten instead of queued.
+
+class Frame:
+    """One published capture: sequence number, capture time, region and (H, W, 4) BGRA pixels."""
+
+    def __init__(self, seq, timestamp, region, pixels):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.region = region
+        self.pixels = pixels
+
+class CaptureWorker(threading.Thread):
+    """Background screen grabber that keeps only the newest frame."""
+
+    def __init__(self, fps=30.0, monitor_index=1):
+        super().__init__(daemon=True)
+        self.pacer = FramePacer(fps)
+        self.monitor_index = monitor_index
+        self.monitors = []
+        self.frames_captured = 0
+        self.capture_errors = 0
+        self.start_error = None              # Why mss could not be opened; the thread has exited
+
+        self._region = None                  # None -> whole monitor_index monitor
+        self._buffers = [None, None]         # front/back pixel buffers
+        self._front = 0
+        self._latest = None
+        self._swap_lock = threading.Lock()   # held by readers while they use the front buffer
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+
+    def set_region(self, region):
+        """Capture `region` ({"left", "top", "width", "height"}) from the next frame on; None = whole monitor."""
+        self._region = dict(region) if region else None
+
+    @property
+    def fps(self):
+        return self.pacer.fps
+
+    def set_fps(self, fps):
+        self.pacer.set_fps(fps)
+
+    def wait_ready(self, timeout=2.0):
+        """Block until the worker has its monitor list, e.g. before building a sampling plan."""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stop_event.set()
+
+    @contextmanager
+    def latest_frame(self):
+        """Yield the newest Frame (or None before the first capture) without waiting for a new grab.
+
+        The front buffer is not swapped while the block runs, so keep the work
+        inside it short (a reduction, not a serial write).
+        """
+        with self._swap_lock:
+            yield self._latest
+
+    def _buffer_for(self, index, height, width):
+        buf = self._buffers[index]
+        if buf is None or buf.shape[:2] != (height, width):
+            buf = np.empty((height, width, 4), dtype=np.uint8)
+            self._buffers[index] = buf
+        return buf
+
+    def run(self):
+        try:
+            sct = mss.mss()
+        except Exception as e:
+            # No display (headless run, locked session): leave the worker dead rather
+            # than let wait_ready() stall every consumer for its full timeout
+            self.start_error = str(e)
+            print(f"❌ Screen capture unavailable: {e}")
+            return
+
+        with sct:
+            self.monitors = sct.monitors
+            self._ready.set()
+
+            while not self._stop_event.is_set():
+                self.pacer.wait(self._stop_event)
+                region = self._region or self.monitors[self.monitor_index]
+                try:
+                    shot = sct.grab(region)
+                    grabbed_at = time.perf_counter()
+                except Exception as e:
+                    self.capture_errors += 1
+                    print(f"⚠️ Screen capture failed: {e}")
+                    time.sleep(0.5)
+                    continue
+
+                # Fill the back buffer, then publish it with a pointer swap
+                back_index = 1 - self._front
+                back = self._buffer_for(back_index, shot.height, shot.width)
+                np.copyto(back, np.frombuffer(shot.raw, dtype=np.uint8).reshape(back.shape))
+                pixels = back.view()
+                pixels.flags.writeable = False
+                region_used = {k: region[k] for k in ("left", "top", "width", "height")}
+
+                with self._swap_lock:
+                    self.frames_captured += 1
+                    self._front = back_index
+                    self._latest = Frame(self.frames_captured, grabbed_at, region_used, pixels)
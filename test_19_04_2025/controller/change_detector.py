@@ -0,0 +1,92 @@
+import time
+import numpy as np
+
+# ** Static-screen Detection**
+# Compares the freshly sampled LED colors (before color correction) and the
+# rest of the payload against what was last sent. While nothing moved beyond a
+# perceptual tolerance, the enhance/serialize/write work is skipped and only a
+# low-rate keepalive goes out.
+# Audio levels (Brightness, Bands) move a little on every audio block, so they
+# only count as a change when they moved more than LEVEL_TOLERANCE since the
+# last sent frame. Otherwise a static screen would never be skipped with audio on.
+
+COLOR_TOLERANCE = 3.0      # Max luma-weighted RGB distance that still counts as "unchanged"
+KEEPALIVE_INTERVAL = 1.0   # Seconds between resends of an unchanged frame
+LEVEL_TOLERANCE = 4        # Brightness / band level steps (0-255) that still count as "unchanged"
+LEVEL_FIELDS = ("Brightness", "Bands")
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+def color_distance(a, b):
+    """Per-LED luma-weighted RGB distance between two (N, 3) color arrays."""
+    diff = (np.asarray(a) - np.asarray(b)).astype(float)
+    return np.sqrt((diff ** 2) @ LUMA_WEIGHTS)
+
+class ChangeDetector:
+    """Tracks the last sent frame and counts how much work static content saved."""
+
+    def __init__(self, tolerance=COLOR_TOLERANCE, keepalive_interval=KEEPALIVE_INTERVAL):
+        self.tolerance = tolerance
+        self.keepalive_interval = keepalive_interval
+        self.last_colors = None
+        self.last_extras = None
+        self.last_sent_time = 0.0
+
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.keepalives_sent = 0
+        self.work_seconds = 0.0       # EMA of CPU time the skipped work costs when it runs
+        self.cpu_seconds_saved = 0.0
+
+    def colors_changed(self, colors):
+        if colors is None or self.last_colors is None:
+            return colors is not None or self.last_colors is not None
+        if colors.shape != self.last_colors.shape:
+            return True
+        return bool(color_distance(colors, self.last_colors).max() > self.tolerance)
+
+    def extras_changed(self, extras):
+        if self.last_extras is None or extras.keys() != self.last_extras.keys():
+            return True
+        for key, value in extras.items():
+            last = self.last_extras[key]
+            if key in LEVEL_FIELDS and value is not None and last is not None:
+                if np.shape(value) != np.shape(last):
+                    return True
+                if np.size(value) and np.abs(np.subtract(value, last)).max() > LEVEL_TOLERANCE:
+                    return True
+            elif value != last:
+                return True
+        return False
+
+    def should_send(self, colors, extras, now=None):
+        """True if `colors` ((N, 3) array or None) or `extras` (dict of other fields) changed, or a keepalive is due."""
+        now = time.monotonic() if now is None else now
+        self.frames_checked += 1
+
+        changed = self.extras_changed(extras) or self.colors_changed(colors)
+        keepalive_due = now - self.last_sent_time >= self.keepalive_interval
+        if not changed and not keepalive_due:
+            self.frames_skipped += 1
+            self.cpu_seconds_saved += self.work_seconds
+            return False
+
+        if not changed:
+            self.keepalives_sent += 1
+        self.last_colors = None if colors is None else colors.copy()
+        self.last_extras = dict(extras)
+        self.last_sent_time = now
+        return True
+
+    def record_work(self, seconds):
+        """Feed in the CPU time the enhance/serialize/write step took for a sent frame."""
+        self.work_seconds = seconds if self.work_seconds == 0 else 0.9 * self.work_seconds + 0.1 * seconds
+
+    def stats(self):
+        checked = max(1, self.frames_checked)
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "keepalives_sent": self.keepalives_sent,
+            "skip_rate": round(self.frames_skipped / checked, 3),
+            "cpu_ms_saved": round(self.cpu_seconds_saved * 1000, 1),
+        }
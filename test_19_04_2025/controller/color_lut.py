@@ -0,0 +1,65 @@
+import numpy as np
+from screen_sampling import enhance_color
+
+# ** Color LUT**
+# Saturation boost, gamma curve and per-channel white balance baked into one
+# LUT_SIZE³ table. The table is rebuilt only when those settings change and
+# is applied with trilinear interpolation to the final LED colors only.
+# Unless color_saturation is set, each path keeps its old look: the grid
+# fallback gets the 1.4 boost it always had, and LED points stay raw.
+
+LUT_SIZE = 33
+DEFAULT_SATURATION = 1.4   # Grid fallback: the old ImageEnhance.Color(1.4)
+POINTS_SATURATION = 1.0    # LED points were always sent unboosted
+DEFAULT_GAMMA = 1.0
+DEFAULT_WHITE_BALANCE = (1.0, 1.0, 1.0)
+
+def build_color_lut(saturation=DEFAULT_SATURATION, gamma=DEFAULT_GAMMA,
+                    white_balance=DEFAULT_WHITE_BALANCE, size=LUT_SIZE):
+    """Return a (size, size, size, 3) float32 table mapping RGB grid points to corrected RGB."""
+    axis = np.linspace(0.0, 255.0, size)
+    r, g, b = np.meshgrid(axis, axis, axis, indexing="ij")
+    rgb = np.stack([r, g, b], axis=-1)
+
+    out = enhance_color(rgb, saturation)
+    out = 255.0 * (out / 255.0) ** gamma
+    out = out * np.asarray(white_balance, dtype=float)
+    return np.clip(out, 0, 255).astype(np.float32)
+
+def apply_color_lut(lut, rgb):
+    """Map an (N, 3) RGB array through the LUT with trilinear interpolation; returns (N, 3) ints."""
+    rgb = np.asarray(rgb, dtype=float).reshape(-1, 3)
+    size = lut.shape[0]
+    pos = np.clip(rgb, 0, 255) * ((size - 1) / 255.0)
+    base = np.minimum(pos.astype(int), size - 2)
+    frac = pos - base
+
+    out = np.zeros_like(rgb)
+    for dr in (0, 1):
+        wr = frac[:, 0] if dr else 1.0 - frac[:, 0]
+        for dg in (0, 1):
+            wg = frac[:, 1] if dg else 1.0 - frac[:, 1]
+            for db in (0, 1):
+                wb = frac[:, 2] if db else 1.0 - frac[:, 2]
+                corner = lut[base[:, 0] + dr, base[:, 1] + dg, base[:, 2] + db]
+                out += (wr * wg * wb)[:, None] * corner
+    return np.rint(out).astype(int)
+
+lut_cache = {"settings": None, "lut": None}
+
+def get_color_lut(saturation=DEFAULT_SATURATION, gamma=DEFAULT_GAMMA, white_balance=DEFAULT_WHITE_BALANCE):
+    """Return the cached LUT, rebuilding it only when the color settings changed."""
+    settings = (float(saturation), float(gamma), tuple(float(v) for v in white_balance))
+    if settings != lut_cache["settings"]:
+        lut_cache["lut"] = build_color_lut(*settings)
+        lut_cache["settings"] = settings
+        print(f"🎨 Rebuilt color LUT: saturation={settings[0]}, gamma={settings[1]}, white balance={settings[2]}")
+    return lut_cache["lut"]
+
+def get_color_lut_for(control, default_saturation=DEFAULT_SATURATION):
+    """LUT for the color settings stored in control_state.json (defaults when absent)."""
+    return get_color_lut(
+        control.get("color_saturation", default_saturation),
+        control.get("color_gamma", DEFAULT_GAMMA),
+        control.get("white_balance", DEFAULT_WHITE_BALANCE),
+    )
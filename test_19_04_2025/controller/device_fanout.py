@@ -0,0 +1,117 @@
+import time
+from latency import LatencyTracker
+from serial_connection import NetworkConnectionManager, SerialConnectionManager
+from serial_protocol import DEFAULT_PROTOCOL
+from serial_writer import SerialWriter
+from transports import UdpTransport, WebSocketTransport
+
+# ** Multi-device Fan-out**
+# One backend captures and analyzes once, then hands the same payload to
+# every configured hoodie. Each device has its own writer thread, connection
+# manager and latency tracker. Because every writer has a latest-value
+# mailbox, a slow or unplugged device only coalesces or drops its own frames
+# and never holds back the others. Devices come from selected_port.json:
+#   {"port": "COM3"}                                          (one device, as before)
+#   {"devices": [{"port": "COM3"}, {"port": "COM4", "layout": [5, 4, 3, 2, 1, 0]}]}
+# Devices on the LAN use a network transport instead of a port:
+#   {"udp": "192.168.1.50:4210"}, {"udp": "255.255.255.255", "broadcast": true},
+#   {"websocket": "ws://192.168.1.50:81/"}
+# A layout lists, for each of the device's LEDs, which sampled color it shows.
+
+def device_name(config):
+    if config.get("udp"):
+        return f"udp://{config['udp']}"
+    if config.get("websocket"):
+        return config["websocket"]
+    return config.get("port")
+
+class OutputDevice:
+    """One hoodie (or a UDP broadcast group) behind one transport, with an optional LED layout."""
+
+    def __init__(self, config):
+        self.name = device_name(config)
+        self.layout = config.get("layout")
+        self.latency = LatencyTracker()
+        self.writer = SerialWriter(latency=self.latency)
+
+        if config.get("udp"):
+            open_transport = lambda: UdpTransport(config["udp"], broadcast=config.get("broadcast", False))
+        elif config.get("websocket"):
+            open_transport = lambda: WebSocketTransport(config["websocket"])
+        else:
+            open_transport = None
+
+        if open_transport:
+            # Datagrams can be lost: send keyframes only, so nothing depends on a missed frame
+            self.writer.encoder.keyframe_interval = 0.0
+            self.connection = NetworkConnectionManager(self.writer, self.name, open_transport)
+        else:
+            self.connection = SerialConnectionManager(self.writer, lambda: self.name)
+
+    def start(self):
+        self.writer.start()
+        self.latency.start()
+        self.connection.start()
+
+    def stop(self):
+        self.connection.stop()
+        self.writer.stop()
+        self.latency.stop()
+
+    def map_layout(self, payload):
+        colors = payload.get("LEDColors")
+        if not self.layout or not colors:
+            return payload
+        mapped = dict(payload)
+        mapped["LEDColors"] = [colors[i] for i in self.layout if 0 <= i < len(colors)]
+        return mapped
+
+    def submit(self, payload, protocol, captured_at, tag_frames):
+        if captured_at is not None:
+            self.latency.record("capture", time.perf_counter() - captured_at)
+        self.writer.tag_frames = tag_frames
+        self.writer.submit(self.map_layout(payload), protocol, captured_at)
+
+    def stats(self):
+        return {
+            "serial": self.writer.stats(),
+            "connection": self.connection.stats(),
+            "latency": self.latency.stats(),
+        }
+
+class DeviceFanout:
+    """The set of configured devices; submit() fans one payload out to all of them."""
+
+    def __init__(self):
+        self.devices = {}
+
+    @property
+    def connected(self):
+        return any(device.connection.connected for device in self.devices.values())
+
+    def sync(self, configs):
+        """Start devices that appeared in `configs` (selected_port.json entries), stop the ones that were removed."""
+        wanted = {device_name(c): c for c in configs if device_name(c)}
+        for name in list(self.devices):
+            if name not in wanted:
+                print(f"🔌 Removing device {name}")
+                self.devices.pop(name).stop()
+        for name, config in wanted.items():
+            if name in self.devices:
+                self.devices[name].layout = config.get("layout")
+            else:
+                print(f"🔌 Adding device {name}")
+                device = OutputDevice(config)
+                self.devices[name] = device
+                device.start()
+
+    def submit(self, payload, protocol=DEFAULT_PROTOCOL, captured_at=None, tag_frames=False):
+        for device in list(self.devices.values()):
+            device.submit(payload, protocol, captured_at, tag_frames)
+
+    def stop(self):
+        for device in self.devices.values():
+            device.stop()
+
+    def stats(self):
+        return {name: device.stats() for name, device in list(self.devices.items())}
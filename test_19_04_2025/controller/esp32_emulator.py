@@ -0,0 +1,384 @@
+import json
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import tty
+import numpy as np
+from serial_protocol import (FRAME_ACK, FRAME_BAUD_ACCEPT, FRAME_BAUD_PROPOSE, FRAME_DELTA, FRAME_MARK,
+                             FRAME_PING, FRAME_PONG, FRAME_READY, FRAME_STATE, PROTOCOL_VERSION,
+                             ProtocolError, apply_delta, decode_frame, decode_state, encode_frame)
+
+# ** ESP32 Emulator**
+# Stand-in for esp32/final/final.ino on a Linux pty, for testing the backend
+# without hardware. It runs the firmware's loop(): read serial frames (binary
+# and JSON lines), then update the NeoPixel buffer with the same
+# colors / audio brightness / breathing fallback logic, then send
+# READY/PONG/BAUD_ACCEPT/ACK frames back.
+# Host bytes reach the emulated UART at the current baud rate (10 bits per
+# byte). Whatever exceeds its RX buffer between two loop() passes is counted
+# as an overrun and dropped, like on the chip.
+# With a UDP port it also listens for the network transport (transports.py):
+# datagrams carry a session id and sequence header, stale ones from the same
+# session are dropped, and replies go back to the sender, the same as the
+# firmware's Wi-Fi listener. UDP frames are parsed in their own buffer.
+#
+#   python esp32_emulator.py            # prints the pty path and live stats
+#   python esp32_emulator.py --select   # also writes it to selected_port.json for backend.py
+#   python esp32_emulator.py --udp      # also listens on UDP port 4210 (--select then picks UDP)
+
+NUM_LEDS = 60
+NUM_COLORS = 6
+MAX_BRIGHTNESS = 125
+MAX_PWM = 175
+MOUSE_SPEED_THRESHOLD = 2.0
+DEFAULT_BAUD = 115200
+MAX_BAUD = 2000000
+BAUD_REVERT_TIME = 1.0
+RX_BUFFER_SIZE = 2048          # Firmware frame buffer
+UART_RX_BUFFER = 256           # ESP32 HardwareSerial receive FIFO
+SHOW_TIME_PER_LED = 30e-6      # WS2812 data time per LED in strip.show()
+BREATHE_STEP = 0.010
+FALLBACK_COLOR = (226, 45, 161)
+UDP_PORT = 4210
+UDP_STALE_WINDOW = 64          # Sequence numbers this far behind the last one are late duplicates
+UDP_HEADER = struct.Struct("<II")  # session id, sequence number
+SELECTED_PORT_PATH = os.path.join(os.path.dirname(__file__), "selected_port.json")
+
+class ESP32Emulator(threading.Thread):
+    """Emulated hoodie controller behind a pty; `port_path` is what the host opens."""
+
+    def __init__(self, num_leds=NUM_LEDS, baudrate=DEFAULT_BAUD, model_wire_time=True, udp_port=None):
+        super().__init__(daemon=True)
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        tty.setraw(self.slave_fd)
+        self.port_path = os.ttyname(self.slave_fd)
+        self.num_leds = num_leds
+        self.baudrate = baudrate
+        self.model_wire_time = model_wire_time
+
+        # Firmware state
+        self.pixels = np.zeros((num_leds, 3), dtype=np.uint8)   # RGB as shown on the strip
+        self.colors = np.zeros((NUM_COLORS, 3), dtype=int)
+        self.audio_brightness = 0
+        self.bands = []                 # Per-zone audio levels, bass first
+        self.received_colors = False
+        self.received_brightness = False
+        self.lights_enabled = True
+        self.vibration_on = False
+        self.sync_with_audio = False
+        self.use_mouse_control = False
+        self.mouse_speed = 0.0
+        self.heater_values = [0, 0, 0]
+        self.heater_pwm = [0, 0, 0]
+        self.vibe_pwm = 0
+        self.fallback_brightness = 0
+        self.breathe_increasing = True
+        self.last_breathe_update = 0.0
+        self.state_body = None
+        self.ack_seq = None
+        self.baud_switch_time = None
+
+        # UART model
+        self.wire_queue = bytearray()   # Written by the host, still "on the wire"
+        self.wire_credit = 0.0
+        self.last_tick = time.perf_counter()
+        self.rx_buffer = bytearray()
+
+        # UDP listener
+        self.udp_sock = None
+        if udp_port is not None:
+            self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_sock.bind(("", udp_port))
+            self.udp_sock.setblocking(False)
+        self.udp_session = None
+        self.udp_last_seq = None
+        self.udp_rx_buffer = bytearray()
+        self.reply_address = None       # Set while the host talks to us over UDP
+
+        # Stats
+        self.frames_received = 0
+        self.parse_errors = 0
+        self.overruns = 0
+        self.bytes_overrun = 0
+        self.bytes_received = 0
+        self.udp_stale = 0
+        self.shows = 0
+        self.received_times = []
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    # ** Host link**
+    def send_frame(self, frame_type, body):
+        try:
+            if self.reply_address is not None:
+                self.udp_sock.sendto(encode_frame(frame_type, body), self.reply_address)
+            else:
+                os.write(self.master_fd, encode_frame(frame_type, body))
+        except OSError:
+            pass
+
+    def read_host(self):
+        """Move new host bytes onto the wire, then deliver what the baud rate allows into the UART FIFO."""
+        while select.select([self.master_fd], [], [], 0)[0]:
+            try:
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                break
+            if not data:
+                break
+            self.wire_queue += data
+
+        if not self.model_wire_time:
+            delivered = len(self.wire_queue)
+        else:
+            now = time.perf_counter()
+            elapsed = now - self.last_tick
+            self.last_tick = now
+            self.wire_credit = min(self.wire_credit + elapsed * self.baudrate / 10, len(self.wire_queue))
+            delivered = int(self.wire_credit)
+            self.wire_credit -= delivered
+
+        fifo = self.wire_queue[:delivered]
+        del self.wire_queue[:delivered]
+        if fifo:
+            self.reply_address = None
+        if len(fifo) > UART_RX_BUFFER:
+            self.overruns += 1
+            self.bytes_overrun += len(fifo) - UART_RX_BUFFER
+            fifo = fifo[:UART_RX_BUFFER]
+        self.bytes_received += len(fifo)
+        return fifo
+
+    # ** readUdpFrames()**
+    def read_udp_frames(self):
+        while self.udp_sock is not None:
+            try:
+                packet, address = self.udp_sock.recvfrom(4096)
+            except (BlockingIOError, OSError):
+                return
+            if len(packet) <= UDP_HEADER.size:
+                continue
+            session, seq = UDP_HEADER.unpack_from(packet)
+            if (session == self.udp_session
+                    and (self.udp_last_seq - seq) & 0xFFFFFFFF <= UDP_STALE_WINDOW):
+                self.udp_stale += 1
+                continue
+            self.udp_session = session
+            self.udp_last_seq = seq
+            self.reply_address = address
+            self.udp_rx_buffer.clear()   # A datagram always starts a new frame
+            self.read_serial_frames(packet[UDP_HEADER.size:], self.udp_rx_buffer)
+
+    # ** readSerialFrames()**
+    def read_serial_frames(self, data, rx=None):
+        rx = self.rx_buffer if rx is None else rx
+        for ch in data:
+            is_json = rx[:1] == b"{"
+            if ch == 0:
+                self.handle_binary_frame(rx)
+                rx.clear()
+            elif ch == 0x0A and is_json:
+                self.handle_json_line(rx)
+                rx.clear()
+            elif ch == 0x0D and is_json:
+                pass
+            elif len(rx) < RX_BUFFER_SIZE:
+                rx.append(ch)
+            else:
+                rx.clear()
+                self.parse_errors += 1
+
+    def frame_received(self):
+        self.frames_received += 1
+        self.received_times.append(time.monotonic())
+
+    def handle_binary_frame(self, rx):
+        try:
+            frame_type, body = decode_frame(bytes(rx))
+        except ProtocolError:
+            self.parse_errors += 1
+            return
+        self.baud_switch_time = None  # A valid frame confirms the current baud rate
+
+        if frame_type == FRAME_BAUD_PROPOSE and len(body) == 4:
+            baud = struct.unpack("<I", body)[0]
+            if not DEFAULT_BAUD <= baud <= MAX_BAUD:
+                baud = DEFAULT_BAUD
+            self.send_frame(FRAME_BAUD_ACCEPT, struct.pack("<I", baud))
+            if baud != DEFAULT_BAUD:
+                self.baudrate = baud
+                self.baud_switch_time = time.monotonic()
+            self.rx_buffer.clear()
+        elif frame_type == FRAME_MARK and len(body) == 2:
+            self.ack_seq = body
+        elif frame_type == FRAME_PING:
+            self.send_frame(FRAME_PONG, body)
+        elif frame_type == FRAME_STATE:
+            self.apply_state_body(body)
+        elif frame_type == FRAME_DELTA:
+            try:
+                if self.state_body is None:
+                    raise ProtocolError("delta before keyframe")
+                self.apply_state_body(apply_delta(self.state_body, body))
+            except ProtocolError:
+                self.state_body = None
+                self.parse_errors += 1
+
+    def apply_state_body(self, body):
+        try:
+            state = decode_state(body)
+        except ProtocolError:
+            self.parse_errors += 1
+            return
+        self.state_body = body
+        self.received_brightness = "Brightness" in state
+        self.audio_brightness = state.get("Brightness", 0)
+        self.bands = state.get("Bands", [])
+        self.vibration_on = state["vibration"]
+        self.sync_with_audio = state["sync_with_audio"]
+        self.lights_enabled = state["lights_enabled"]
+        self.use_mouse_control = state.get("mouse", False)
+        self.mouse_speed = state.get("MouseSpeed", 0.0)
+        self.heater_values = state["heaters"]
+        self.set_colors(state.get("LEDColors"))
+        self.frame_received()
+
+    def handle_json_line(self, rx):
+        try:
+            doc = json.loads(rx.decode())
+        except ValueError:
+            self.parse_errors += 1
+            return
+        self.audio_brightness = doc.get("Brightness", 0)
+        self.bands = doc.get("Bands", [])[:16]
+        self.received_brightness = "Brightness" in doc
+        self.vibration_on = doc.get("vibration", False)
+        self.sync_with_audio = doc.get("sync_with_audio", False)
+        self.lights_enabled = doc.get("lights_enabled", True)
+        self.use_mouse_control = doc.get("mouse", False)
+        self.mouse_speed = doc.get("MouseSpeed", 0.0)
+        heaters = doc.get("heaters", [])
+        self.heater_values = [heaters[i] if i < len(heaters) else 0 for i in range(3)]
+        self.set_colors(doc.get("LEDColors"))
+        self.frame_received()
+
+    def set_colors(self, led_colors):
+        self.received_colors = led_colors is not None
+        if self.received_colors:
+            for i in range(NUM_COLORS):
+                c = led_colors[i] if i < len(led_colors) else {}
+                self.colors[i] = (c.get("R", 0), c.get("G", 0), c.get("B", 0))
+
+    # ** updateLEDStrip() / updateActuators()**
+    def show(self):
+        self.shows += 1
+        if self.model_wire_time:
+            time.sleep(self.num_leds * SHOW_TIME_PER_LED)
+        if self.ack_seq is not None:
+            self.send_frame(FRAME_ACK, self.ack_seq)
+            self.ack_seq = None
+
+    def update_led_strip(self, now):
+        if not self.lights_enabled:
+            self.pixels[:] = 0
+            self.show()
+        elif not self.received_colors and not self.received_brightness:
+            if now - self.last_breathe_update > BREATHE_STEP:
+                level = self.fallback_brightness * MAX_BRIGHTNESS
+                self.pixels[:] = [c * level // 65025 for c in FALLBACK_COLOR]
+                self.show()
+                self.fallback_brightness += 1 if self.breathe_increasing else -1
+                if self.fallback_brightness >= 255:
+                    self.breathe_increasing = False
+                if self.fallback_brightness <= 0:
+                    self.breathe_increasing = True
+                self.last_breathe_update = now
+        elif self.received_colors:
+            section = self.num_leds // NUM_COLORS
+            for i in range(NUM_COLORS):
+                self.pixels[i * section:(i + 1) * section] = self.colors[i]
+            self.show()
+        elif self.bands:
+            # One band per zone: bass drives the first section, treble the last
+            section = self.num_leds // NUM_COLORS
+            for i in range(NUM_COLORS):
+                scaled = self.bands[i * len(self.bands) // NUM_COLORS] * MAX_BRIGHTNESS // 255
+                self.pixels[i * section:(i + 1) * section] = [c * scaled // 255 for c in FALLBACK_COLOR]
+            self.show()
+        else:
+            scaled = self.audio_brightness * MAX_BRIGHTNESS // 255
+            self.pixels[:] = [c * scaled // 255 for c in FALLBACK_COLOR]
+            self.show()
+
+    def update_actuators(self):
+        if self.use_mouse_control:
+            pwm = 0 if self.mouse_speed < MOUSE_SPEED_THRESHOLD else int(self.mouse_speed / 5.0 * MAX_PWM)
+            self.heater_pwm = [pwm] * 3
+        else:
+            self.heater_pwm = [{1: 40, 2: 100, 3: 175}.get(v, 0) for v in self.heater_values]
+        raw = min(255, max(0, int(self.audio_brightness * 15.0)))
+        self.vibe_pwm = (raw if self.sync_with_audio else 255) if self.vibration_on else 0
+
+    def run(self):
+        self.send_frame(FRAME_READY, bytes([PROTOCOL_VERSION, NUM_COLORS]))
+        while not self._stop_event.is_set():
+            shows = self.shows
+            self.read_serial_frames(self.read_host())
+            self.read_udp_frames()
+            now = time.monotonic()
+            if self.baud_switch_time is not None and now - self.baud_switch_time > BAUD_REVERT_TIME:
+                self.baudrate = DEFAULT_BAUD
+                self.baud_switch_time = None
+                self.rx_buffer.clear()
+            self.update_led_strip(now)
+            self.update_actuators()
+            if self.shows == shows or not self.model_wire_time:
+                time.sleep(0.0005)  # Don't spin a host core while idle
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+        if self.udp_sock is not None:
+            self.udp_sock.close()
+
+    def stats(self):
+        now = time.monotonic()
+        self.received_times = [t for t in self.received_times if now - t <= 1.0]
+        return {
+            "port": self.port_path,
+            "baudrate": self.baudrate,
+            "received_fps": len(self.received_times),
+            "frames_received": self.frames_received,
+            "parse_errors": self.parse_errors,
+            "overruns": self.overruns,
+            "bytes_overrun": self.bytes_overrun,
+            "bytes_received": self.bytes_received,
+            "udp_stale": self.udp_stale,
+            "wire_backlog_bytes": len(self.wire_queue),
+            "shows": self.shows,
+        }
+
+if __name__ == "__main__":
+    use_udp = "--udp" in sys.argv
+    emulator = ESP32Emulator(udp_port=UDP_PORT if use_udp else None)
+    emulator.start()
+    print(f"🔌 Emulated ESP32 on {emulator.port_path}" + (f" and UDP port {UDP_PORT}" if use_udp else ""))
+    if "--select" in sys.argv:
+        selection = {"devices": [{"udp": f"127.0.0.1:{UDP_PORT}"}]} if use_udp else {"port": emulator.port_path}
+        with open(SELECTED_PORT_PATH, "w") as f:
+            json.dump(selection, f)
+        print(f"💾 Saved {selection} to selected_port.json")
+    try:
+        while True:
+            time.sleep(1.0)
+            stats = emulator.stats()
+            print(f"fps {stats['received_fps']:>3}  frames {stats['frames_received']:>6}  "
+                  f"errors {stats['parse_errors']}  overruns {stats['overruns']}  "
+                  f"backlog {stats['wire_backlog_bytes']} B  first LED {emulator.pixels[0].tolist()}")
+    except KeyboardInterrupt:
+        emulator.stop()
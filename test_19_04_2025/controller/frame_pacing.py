@@ -0,0 +1,175 @@
+import time
+from collections import deque
+from change_detector import color_distance
+
+# ** Adaptive Frame-rate Governor**
+# Raises the capture/send rate toward a ceiling while colors (or audio
+# brightness) move a lot between frames, decays toward a floor while content
+# is static, and backs off whenever the process uses more than CPU_BUDGET
+# of one core between two frames. The budget is a share of wall time, not CPU
+# seconds per frame, because background threads (capture, audio, serial) burn
+# CPU in proportion to the time between frames: a per-frame budget is blown at
+# low rates and the governor could never climb back from the floor.
+# effective_fps counts the updates in the last RATE_WINDOW seconds. The
+# interval into the second update is skipped: the pacer's first wait()
+# returns at once, so that interval is close to zero.
+
+GOVERNOR_MIN_FPS = 2.0
+GOVERNOR_MAX_FPS = 30.0
+ACTIVITY_HIGH = 8.0            # Mean LED color distance (or brightness step) that counts as fast motion
+ACTIVITY_LOW = 2.0             # Below this the content is treated as static
+RAISE_FACTOR = 1.25
+DECAY_FACTOR = 0.9
+CPU_BUDGET = 0.45              # Share of one core the process may use before backing off (15 ms per frame at 30 fps)
+CPU_BACKOFF_FACTOR = 0.7
+RATE_WINDOW = 2.0              # Seconds of update timestamps behind effective_fps
+
+class FrameRateGovernor:
+    """Picks the next frame interval from frame-to-frame activity and CPU cost."""
+
+    def __init__(self, start_fps=10.0, min_fps=GOVERNOR_MIN_FPS, max_fps=GOVERNOR_MAX_FPS,
+                 cpu_budget=CPU_BUDGET):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.cpu_budget = cpu_budget
+        self.fps = min(max(start_fps, min_fps), max_fps)
+
+        self.prev_colors = None
+        self.prev_brightness = None
+        self.last_activity = 0.0
+        self.last_cpu_seconds = 0.0
+        self.last_cpu_share = 0.0
+        self.cpu_backoffs = 0
+        self.effective_fps = 0.0
+        self.updates = 0
+        self.update_times = deque()
+        self.last_process_cpu = None
+        self.last_update_time = None
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def measure_activity(self, colors, brightness):
+        """Mean LED color distance to the previous frame, or the brightness step if that is larger."""
+        activity = 0.0
+        if colors is not None and self.prev_colors is not None and colors.shape == self.prev_colors.shape:
+            activity = float(color_distance(colors, self.prev_colors).mean())
+        if brightness is not None and self.prev_brightness is not None:
+            activity = max(activity, abs(brightness - self.prev_brightness))
+        self.prev_colors = None if colors is None else colors.copy()
+        self.prev_brightness = brightness
+        return activity
+
+    def update(self, colors=None, brightness=None, process_cpu=None, now=None):
+        """Feed one frame's samples; returns the new target fps.
+
+        CPU cost is the whole process's time.process_time() since the previous
+        update over the wall time between them, so capture, audio and serial
+        threads count against the budget too.
+        """
+        now = time.perf_counter() if now is None else now
+        process_cpu = time.process_time() if process_cpu is None else process_cpu
+        cpu_seconds = 0.0 if self.last_process_cpu is None else process_cpu - self.last_process_cpu
+        wall_seconds = 0.0 if self.last_update_time is None else now - self.last_update_time
+        cpu_share = cpu_seconds / wall_seconds if wall_seconds > 0 else 0.0
+        self.last_process_cpu = process_cpu
+        self.last_update_time = now
+        self.updates += 1
+        if self.updates > 1:
+            self.update_times.append(now)
+            while now - self.update_times[0] > RATE_WINDOW and len(self.update_times) > 2:
+                self.update_times.popleft()
+            span = now - self.update_times[0]
+            if span > 0:
+                self.effective_fps = (len(self.update_times) - 1) / span
+
+        self.last_activity = self.measure_activity(colors, brightness)
+        self.last_cpu_seconds = cpu_seconds
+        self.last_cpu_share = cpu_share
+
+        if cpu_share > self.cpu_budget:
+            self.cpu_backoffs += 1
+            self.fps *= CPU_BACKOFF_FACTOR
+        elif self.last_activity >= ACTIVITY_HIGH:
+            self.fps *= RAISE_FACTOR
+        elif self.last_activity <= ACTIVITY_LOW:
+            self.fps *= DECAY_FACTOR
+        self.fps = min(max(self.fps, self.min_fps), self.max_fps)
+        return self.fps
+
+    def stats(self):
+        return {
+            "target_fps": round(self.fps, 2),
+            "effective_fps": round(self.effective_fps, 2),
+            "activity": round(self.last_activity, 2),
+            "cpu_ms_per_frame": round(self.last_cpu_seconds * 1000, 2),
+            "cpu_percent": round(self.last_cpu_share * 100, 1),
+            "cpu_backoffs": self.cpu_backoffs,
+        }
+
+# ** Deadline Frame Pacer**
+# Producer loops wait for the next perf_counter() deadline instead of sleeping
+# a fixed interval after their work, so the real period doesn't stretch by the
+# work time. A loop that overruns skips the frames it missed (no catch-up
+# burst) and the lateness/overruns are recorded.
+
+class FramePacer:
+    """Keeps a loop on a fixed-rate deadline grid and records jitter and overrun statistics."""
+
+    def __init__(self, fps):
+        self.fps = float(fps)
+        self.next_deadline = None
+        self.frames = 0
+        self.overruns = 0
+        self.frames_skipped = 0
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps
+
+    def set_fps(self, fps):
+        """Change the rate; the new interval applies from the next deadline on."""
+        self.fps = max(0.1, float(fps))
+
+    def wait(self, stop_event=None):
+        """Block until the next deadline (or until stop_event is set). Returns the number of frames skipped."""
+        now = time.perf_counter()
+        if self.next_deadline is None:
+            self.next_deadline = now
+
+        skipped = 0
+        delay = self.next_deadline - now
+        if delay > 0:
+            if stop_event is not None:
+                stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+            lateness = time.perf_counter() - self.next_deadline
+        else:
+            # Missed the deadline: drop whole frames we can't make up, keep the grid
+            lateness = -delay
+            skipped = int(lateness // self.interval)
+            if skipped:
+                self.overruns += 1
+                self.frames_skipped += skipped
+                self.next_deadline += skipped * self.interval
+
+        self.frames += 1
+        self.jitter_total += max(lateness, 0.0)
+        self.jitter_max = max(self.jitter_max, lateness)
+        self.next_deadline += self.interval
+        return skipped
+
+    def stats(self):
+        frames = max(1, self.frames)
+        return {
+            "target_fps": round(self.fps, 2),
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "frames_skipped": self.frames_skipped,
+            "jitter_ms_mean": round(self.jitter_total / frames * 1000, 2),
+            "jitter_ms_max": round(self.jitter_max * 1000, 2),
+        }
@@ -0,0 +1,162 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+from serial_protocol import FRAME_ACK, ProtocolError, decode_frame
+
+# ** Latency Instrumentation**
+# With latency tracking on, the serial writer follows each frame with a
+# FRAME_MARK carrying a 16-bit sequence number and remembers when that frame
+# was written. The firmware echoes the number back in a FRAME_ACK right after
+# the next strip.show(). Rolling histograms cover each pipeline stage:
+#   capture    screen grab -> payload handed to the writer
+#   encode     payload -> frame bytes
+#   write      ser.write() call
+#   ack        write start -> device acknowledged strip.show()
+#   end_to_end screen grab -> device acknowledged strip.show()
+# `python latency.py` prints the percentiles backend.py last published, per device.
+
+LATENCY_WINDOW = 500       # Samples kept per stage
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+PENDING_LIMIT = 256        # Unacknowledged frames remembered before counting them as missed
+STAGES = ("capture", "encode", "write", "ack", "end_to_end")
+STATS_JSON_PATH = os.path.join(os.path.dirname(__file__), "pipeline_stats.json")
+
+class RollingHistogram:
+    """The last `window` latency samples (ms) with percentile and bucket summaries."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def stats(self):
+        if not self.samples:
+            return {"count": 0}
+        values = np.fromiter(self.samples, dtype=float)
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        counts = np.histogram(values, bins=(0,) + HISTOGRAM_EDGES_MS + (np.inf,))[0]
+        labels = [f"<{edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f">={HISTOGRAM_EDGES_MS[-1]}ms"]
+        return {
+            "count": len(values),
+            "p50_ms": round(p50, 2),
+            "p90_ms": round(p90, 2),
+            "p99_ms": round(p99, 2),
+            "max_ms": round(values.max(), 2),
+            "histogram": dict(zip(labels, counts.tolist())),
+        }
+
+class LatencyTracker(threading.Thread):
+    """Collects per-stage latencies and reads the device's acknowledgements off the port."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.histograms = {stage: RollingHistogram() for stage in STAGES}
+        self.pending = OrderedDict()   # seq -> (write start, capture time or None)
+        self.next_seq = 0
+        self.acks_received = 0
+        self.acks_missed = 0
+        self.port = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def record(self, stage, seconds):
+        self.histograms[stage].add(seconds * 1000)
+
+    def tag(self, write_start, captured_at=None):
+        """Sequence number for a frame about to be written at `write_start` (perf_counter)."""
+        with self._lock:
+            seq = self.next_seq
+            self.next_seq = (seq + 1) & 0xFFFF
+            self.pending[seq] = (write_start, captured_at)
+            while len(self.pending) > PENDING_LIMIT:
+                self.pending.popitem(last=False)
+                self.acks_missed += 1
+        return seq
+
+    def acknowledge(self, seq, now=None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            entry = self.pending.pop(seq, None)
+            if entry is None:
+                return
+            # Frames written before this one were never shown on their own
+            while self.pending and next(iter(self.pending.values()))[0] < entry[0]:
+                self.pending.popitem(last=False)
+                self.acks_missed += 1
+            self.acks_received += 1
+        write_start, captured_at = entry
+        self.record("ack", now - write_start)
+        if captured_at is not None:
+            self.record("end_to_end", now - captured_at)
+
+    def set_port(self, port):
+        self.port = port
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        buffer = bytearray()
+        while not self._stop_event.is_set():
+            port = self.port
+            if port is None:
+                buffer.clear()
+                self._stop_event.wait(0.1)
+                continue
+            try:
+                data = port.read(max(1, port.in_waiting))
+            except Exception:
+                self._stop_event.wait(0.1)  # Port closed under us; the connection manager reconnects
+                continue
+            now = time.perf_counter()
+            for byte in data:
+                if byte != 0:
+                    buffer.append(byte)
+                    continue
+                try:
+                    frame_type, body = decode_frame(bytes(buffer))
+                    if frame_type == FRAME_ACK and len(body) == 2:
+                        self.acknowledge(struct.unpack("<H", body)[0], now)
+                except ProtocolError:
+                    pass
+                buffer.clear()
+
+    def stats(self):
+        stats = {stage: histogram.stats() for stage, histogram in self.histograms.items()}
+        stats["acks_received"] = self.acks_received
+        stats["acks_missed"] = self.acks_missed
+        return stats
+
+def print_latency_report(latency):
+    print(f"{'stage':<12}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}   (ms)")
+    for stage in STAGES:
+        s = latency.get(stage, {})
+        if s.get("count"):
+            print(f"{stage:<12}{s['count']:>7}{s['p50_ms']:>9}{s['p90_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}")
+        else:
+            print(f"{stage:<12}{0:>7}")
+    print(f"acks received: {latency.get('acks_received', 0)}, missed: {latency.get('acks_missed', 0)}")
+
+if __name__ == "__main__":
+    # python latency.py [--watch]
+    while True:
+        try:
+            with open(STATS_JSON_PATH, "r") as f:
+                devices = json.load(f).get("devices", {})
+            if not devices:
+                print("No devices in pipeline_stats.json (is backend.py running?)")
+            for port_name, device in devices.items():
+                print(f"🔌 {port_name}")
+                print_latency_report(device["latency"])
+        except Exception as e:
+            print(f"⚠️ Could not read pipeline_stats.json: {e}")
+        if "--watch" not in sys.argv:
+            break
+        time.sleep(1.0)
+        print()
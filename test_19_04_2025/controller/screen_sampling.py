@@ -0,0 +1,264 @@
+import json
+import os
+import time
+import mss
+import numpy as np
+
+PLAN_RECHECK_INTERVAL = 2.0  # Seconds between mtime/resolution checks of a cached plan
+
+# ** LED Sampling Plan**
+# Built once from a points file (led_points.json / screen_points.json) and
+# cached next to it as a .npz, so the per-frame path does no file I/O or JSON
+# parsing. Rebuilt only when the JSON's mtime or the screen resolution changes.
+
+class SamplingPlan:
+    """Precomputed gather indices and weights for reading every LED window out of one bounding-box grab."""
+
+    def __init__(self, indices, weights, bbox, monitor, source_mtime=0.0):
+        self.indices = indices            # (N, K) flat pixel indices into the bbox grab
+        self.weights = weights            # (N, K) averaging weight of each pixel
+        self.bbox = bbox                  # capture region: {"left", "top", "width", "height"}
+        self.monitor = monitor            # screen geometry the plan was built for
+        self.source_mtime = source_mtime  # mtime of the points JSON the plan was built from
+
+    @classmethod
+    def from_points(cls, points, monitor, window=3, source_mtime=0.0):
+        """Build a plan for window×window averages around each (x, y) point."""
+        count = len(points)
+        if count == 0:
+            return cls(np.zeros((0, window * window), dtype=np.int32),
+                       np.zeros((0, window * window)), None, dict(monitor), source_mtime)
+
+        half = window // 2
+        pts = np.asarray(points, dtype=float)
+        # Top-left corner of each LED window (same int() truncation as the per-point grabs)
+        xs = pts[:, 0].astype(int) - half
+        ys = pts[:, 1].astype(int) - half
+
+        # Bounding box of all windows, clamped to the screen
+        left = max(int(xs.min()), monitor["left"])
+        top = max(int(ys.min()), monitor["top"])
+        right = min(int(xs.max()) + window, monitor["left"] + monitor["width"])
+        bottom = min(int(ys.max()) + window, monitor["top"] + monitor["height"])
+        if right <= left or bottom <= top:
+            return cls(np.zeros((count, window * window), dtype=np.int32),
+                       np.zeros((count, window * window)), None, dict(monitor), source_mtime)
+        bbox = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+        offsets = np.arange(window)
+        rows = np.clip((ys - top)[:, None] + offsets, 0, bbox["height"] - 1)
+        cols = np.clip((xs - left)[:, None] + offsets, 0, bbox["width"] - 1)
+        indices = (rows[:, :, None] * bbox["width"] + cols[:, None, :]).reshape(count, -1)
+        weights = np.full(indices.shape, 1.0 / indices.shape[1])
+        return cls(indices.astype(np.int32), weights, bbox, dict(monitor), source_mtime)
+
+    def sample(self, sct):
+        """Grab the bounding box once and return an (N, 3) int array of RGB averages."""
+        if self.bbox is None:
+            return np.zeros((len(self.indices), 3), dtype=int)
+        return self.sample_frame(bgra_view(sct.grab(self.bbox)))
+
+    def sample_frame(self, frame):
+        """Same as sample(), from an already captured (H, W, 4) BGRA frame of self.bbox."""
+        if self.bbox is None:
+            return np.zeros((len(self.indices), 3), dtype=int)
+        pixels = frame.reshape((-1, 4))
+        bgr = np.einsum("nk,nkc->nc", self.weights, pixels[self.indices, :3])
+        # 1/K weights can land a hair below an exact integer average; nudge before truncating
+        return (bgr[:, ::-1] + 1e-6).astype(int)
+
+    def sample_colors(self, sct):
+        """Same as sample(), as the list of {"R", "G", "B"} dicts the ESP32 expects."""
+        return [{"R": r, "G": g, "B": b} for r, g, b in self.sample(sct).tolist()]
+
+    def save(self, path):
+        bbox = self.bbox or {"left": 0, "top": 0, "width": 0, "height": 0}
+        np.savez(
+            path,
+            indices=self.indices,
+            weights=self.weights,
+            bbox=np.array([bbox[k] for k in ("left", "top", "width", "height")]),
+            monitor=np.array([self.monitor[k] for k in ("left", "top", "width", "height")]),
+            source_mtime=np.array(self.source_mtime),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            bbox = dict(zip(("left", "top", "width", "height"), data["bbox"].tolist()))
+            monitor = dict(zip(("left", "top", "width", "height"), data["monitor"].tolist()))
+            return cls(
+                data["indices"],
+                data["weights"],
+                bbox if bbox["width"] > 0 else None,
+                monitor,
+                float(data["source_mtime"]),
+            )
+
+    def matches(self, source_mtime, monitor):
+        """True if the plan is still valid for this points file mtime and screen geometry."""
+        return self.source_mtime == source_mtime and all(
+            self.monitor[k] == monitor[k] for k in ("left", "top", "width", "height"))
+
+def read_points_file(points_path):
+    """Read LED points from either [{"x":..,"y":..}] (led_points.json) or [[x, y]] (screen_points.json)."""
+    with open(points_path, "r") as f:
+        raw_points = json.load(f)
+    return [(pt["x"], pt["y"]) if isinstance(pt, dict) else tuple(pt) for pt in raw_points]
+
+def load_sampling_plan(points_path, monitor, window=3):
+    """Load the .npz plan cached next to points_path, rebuilding it if the JSON or screen changed."""
+    source_mtime = os.path.getmtime(points_path)
+    cache_path = os.path.splitext(points_path)[0] + ".npz"
+
+    if os.path.exists(cache_path):
+        try:
+            plan = SamplingPlan.load(cache_path)
+            if plan.matches(source_mtime, monitor) and plan.indices.shape[1] == window * window:
+                return plan
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable sampling plan {cache_path}: {e}")
+
+    plan = SamplingPlan.from_points(read_points_file(points_path), monitor, window, source_mtime)
+    try:
+        plan.save(cache_path)
+        print(f"✅ Rebuilt sampling plan for {len(plan.indices)} LEDs -> {cache_path}")
+    except Exception as e:
+        print(f"⚠️ Could not cache sampling plan: {e}")
+    return plan
+
+_plan_cache = {}
+
+def get_sampling_plan(points_path, sct, window=3):
+    """Hot-loop accessor: returns the in-memory plan, re-validating it at most every PLAN_RECHECK_INTERVAL."""
+    now = time.monotonic()
+    cached = _plan_cache.get(points_path)
+    if cached and now - cached[1] < PLAN_RECHECK_INTERVAL:
+        return cached[0]
+
+    monitor = sct.monitors[0]
+    plan = cached[0] if cached else None
+    if plan is None or not plan.matches(os.path.getmtime(points_path), monitor):
+        plan = load_sampling_plan(points_path, monitor, window)
+    _plan_cache[points_path] = (plan, now)
+    return plan
+
+# ** Grid Reduction**
+# Replaces the per-cell `np.mean(img[y1:y2, x1:x2])` loops: the frame is
+# cropped to a multiple of the grid and every cell is summed in one pass.
+# Integer sums are exact, so the averages match the old loops bit for bit.
+
+def reduce_grid(img, rows, cols, region=None):
+    """Average an (H, W, C) image over a rows×cols grid; returns (rows, cols, C) float means."""
+    if region is not None:
+        x1, y1, x2, y2 = region
+        img = img[y1:y2, x1:x2]
+    box_height = img.shape[0] // rows
+    box_width = img.shape[1] // cols
+    channels = img.shape[2]
+
+    # Rows first: a full-width band is contiguous, so this reshape is a free view
+    bands = img[:rows * box_height].reshape(rows, box_height, img.shape[1], channels)
+    band_sums = bands.sum(axis=1, dtype=np.uint32)
+    cell_sums = band_sums[:, :cols * box_width].reshape(rows, cols, box_width, channels).sum(axis=2)
+    return cell_sums / float(box_height * box_width)
+
+def grid_cell_colors(img, rows, cols, region=None):
+    """Row-major (rows*cols, C) int cell colors, the same values the old per-cell loops produced."""
+    return reduce_grid(img, rows, cols, region).reshape(rows * cols, -1).astype(int)
+
+# ** Zero-copy Capture**
+# The mss buffer is wrapped as a read-only BGRA view and reduced in place.
+# Channel reorder and the saturation boost run on the reduced colors only
+# (100 cells / 24 LEDs) instead of on four full-resolution copies of the frame.
+
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])  # PIL "L" conversion weights (R, G, B)
+
+def bgra_view(shot):
+    """Read-only (H, W, 4) BGRA view over an mss screenshot's raw buffer."""
+    frame = np.frombuffer(shot.raw, dtype=np.uint8).reshape((shot.height, shot.width, 4))
+    frame.flags.writeable = False
+    return frame
+
+def enhance_color(rgb, factor):
+    """ImageEnhance.Color on reduced colors: blend each RGB color away from its grey level by `factor`.
+
+    The blend is linear, so boosting the averages gives the same result as
+    averaging a boosted frame, up to PIL's per-pixel clipping and rounding.
+    """
+    rgb = np.asarray(rgb, dtype=float)
+    grey = (rgb @ LUMA_WEIGHTS)[..., None]
+    return np.clip(grey + factor * (rgb - grey), 0, 255)
+
+def grid_colors_from_frame(frame, rows, cols, saturation=1.0, region=None):
+    """Row-major (rows*cols, 3) int RGB grid colors from an (H, W, 4) BGRA frame."""
+    bgra = reduce_grid(frame, rows, cols, region).reshape(rows * cols, 4)
+    return enhance_color(bgra[:, 2::-1], saturation).astype(int)
+
+def grid_colors_from_shot(shot, rows, cols, saturation=1.0, region=None):
+    """Row-major (rows*cols, 3) int RGB grid colors straight from an mss screenshot."""
+    return grid_colors_from_frame(bgra_view(shot), rows, cols, saturation, region)
+
+# ** Batched LED Sampling**
+# Every LED window is read out of ONE grab of the bounding box around all
+# points, instead of doing a separate sct.grab() round-trip per LED.
+
+def sample_color_array(points, window=3, sct=None):
+    """Return an (N, 3) int array with the average RGB around each point, from a single screen grab."""
+    if sct is None:
+        with mss.mss() as own_sct:
+            return sample_color_array(points, window, own_sct)
+    return SamplingPlan.from_points(points, sct.monitors[0], window).sample(sct)
+
+def sample_colors_at(points, window=3, sct=None):
+    """Sample average RGB values from small screen regions around each point."""
+    try:
+        colors = sample_color_array(points, window, sct)
+    except Exception as e:
+        print(f"⚠️ Sampling failed for {len(points)} points: {e}")
+        return [{"R": 0, "G": 0, "B": 0} for _ in points]  # fallback
+    return [{"R": r, "G": g, "B": b} for r, g, b in colors.tolist()]
+
+# ** Benchmark**
+# python screen_sampling.py -> per-frame time and tracemalloc peak of the old
+# np.array/cvtColor/PIL/enhance grid path vs. the zero-copy path, on a synthetic frame.
+
+def _legacy_grid_colors(shot, rows, cols, saturation):
+    import cv2
+    from PIL import Image, ImageEnhance
+    img = np.array(shot)
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img_rgb = np.array(ImageEnhance.Color(Image.fromarray(img_rgb)).enhance(saturation))
+    box_width = img_rgb.shape[1] // cols
+    box_height = img_rgb.shape[0] // rows
+    colors = []
+    for row in range(rows):
+        for col in range(cols):
+            section = img_rgb[row * box_height:(row + 1) * box_height, col * box_width:(col + 1) * box_width]
+            colors.append(np.mean(section, axis=(0, 1)).astype(int))
+    return np.array(colors)
+
+def _benchmark(width, height, frames=20):
+    import tracemalloc
+    from mss.screenshot import ScreenShot
+
+    rng = np.random.default_rng(0)
+    raw = bytearray(rng.integers(0, 256, width * height * 4, dtype=np.uint8).tobytes())
+    shot = ScreenShot(raw, {"left": 0, "top": 0, "width": width, "height": height})
+
+    for name, fn in (("legacy", _legacy_grid_colors), ("zero-copy", grid_colors_from_shot)):
+        fn(shot, 10, 10, 1.4)  # warm up
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(frames):
+            fn(shot, 10, 10, 1.4)
+        elapsed = (time.perf_counter() - start) / frames
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{width}x{height} {name:>9}: {elapsed * 1000:7.2f} ms/frame, "
+              f"tracemalloc peak {peak / 1e6:7.2f} MB")
+    print("   (PIL/cv2 buffers are not visible to tracemalloc, so the legacy peak is a lower bound)")
+
+if __name__ == "__main__":
+    for width, height in ((1920, 1080), (3840, 2160)):
+        _benchmark(width, height)
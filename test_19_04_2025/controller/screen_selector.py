@@ -1,6 +1,6 @@
 import tkinter as tk
 import mss
-import numpy as np
+from screen_sampling import sample_color_array
 
 NUM_LEDS = 24
 DOT_RADIUS = 5
@@ -66,21 +66,6 @@ def get_equidistant_points(p0, p1, n):
     return [(x0 + (x1 - x0) * i / (n - 1), y0 + (y1 - y0) * i / (n - 1)) for i in range(n)]
 
 def sample_colors_at(points, window=3):
-    half = window // 2
-    colors = []
     with mss.mss() as sct:
-        for x, y in points:
-            left = int(x) - half
-            top = int(y) - half
-            region = {
-                "left": left,
-                "top": top,
-                "width": window,
-                "height": window
-            }
-            img = sct.grab(region)
-            arr = np.frombuffer(img.rgb, dtype=np.uint8)
-            arr = arr.reshape((window, window, 3))
-            avg = tuple(arr.mean(axis=(0, 1)).astype(int))
-            colors.append(avg)
-    return colors
\ No newline at end of file
+        colors = sample_color_array(points, window, sct)
+    return [tuple(c) for c in colors.tolist()]
\ No newline at end of file
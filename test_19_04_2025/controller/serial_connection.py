@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+import serial
+import serial.tools.list_ports
+from serial_link import DEFAULT_BAUD, negotiate_baud, wait_until_ready
+from serial_protocol import PROTOCOL_JSON
+
+# ** Serial Connection Manager**
+# Owns the ESP32's serial handle for the whole session. A background thread
+# opens the port selected in selected_port.json and hands it to the
+# SerialWriter. It notices write failures (reported by the writer) and
+# unplugged devices (by polling list_ports), and reconnects with exponential
+# backoff. After reconnecting, the last full state is replayed, so the hoodie
+# doesn't wait for the next change. A device that never answers the handshake
+# is old firmware: it gets JSON lines at the default baud rate instead of
+# binary frames. How long opening, the device handshake and the first frame
+# took is reported in stats().
+
+PORT_POLL_INTERVAL = 1.0     # Seconds between list_ports presence checks while connected
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 10.0
+
+def port_present(port_name):
+    """True if `port_name` is still enumerated (or, for tty paths, still exists)."""
+    if any(p.device == port_name for p in serial.tools.list_ports.comports()):
+        return True
+    return os.path.exists(port_name)
+
+class SerialConnectionManager(threading.Thread):
+    """Connects, watches and reconnects the device port on behalf of a SerialWriter."""
+
+    def __init__(self, writer, get_port_name):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.get_port_name = get_port_name
+        self.ser = None
+        self.port_name = None
+        self.connects = 0
+        self.disconnects = 0
+        self.last_error = None
+        self.created_at = time.perf_counter()
+        self.open_started_at = None
+        self.ready_seconds = None
+        self.first_frame_reported = False
+        self._failed = threading.Event()
+        self._stop_event = threading.Event()
+        writer.on_write_error = self.report_failure
+
+    @property
+    def connected(self):
+        return self.ser is not None
+
+    def device_present(self, port_name):
+        return port_present(port_name)
+
+    def report_failure(self, error):
+        """Called from the writer thread when a write fails."""
+        self.last_error = str(error)
+        self._failed.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._failed.set()
+
+    def open_port(self, port_name):
+        self.open_started_at = time.perf_counter()
+        ser = serial.Serial(port_name, DEFAULT_BAUD, timeout=1)
+        ser.reset_input_buffer()  # Drop boot messages from the reset
+
+        # The ESP32 resets on open: wait for its handshake instead of a fixed sleep
+        self.ready_seconds = wait_until_ready(ser)
+        if self.ready_seconds is None:
+            print("⚠️ No ready reply from the device (old firmware?), falling back to JSON")
+            self.writer.protocol_override = PROTOCOL_JSON
+        else:
+            print(f"✅ Device ready after {self.ready_seconds * 1000:.0f} ms")
+            self.writer.protocol_override = None
+            negotiate_baud(ser)
+        return ser
+
+    def connect(self):
+        port_name = self.get_port_name()
+        if not port_name or not self.device_present(port_name):
+            return False
+        try:
+            ser = self.open_port(port_name)
+        except (serial.SerialException, OSError) as e:
+            self.last_error = str(e)
+            print(f"⚠️ Failed to connect to {port_name}: {e}")
+            return False
+
+        self.ser = ser
+        self.port_name = port_name
+        self.connects += 1
+        self._failed.clear()
+        self.first_frame_reported = False
+        self.writer.set_port(ser)
+        self.writer.replay_last()
+        print(f"✅ Connected to ESP32 on {port_name}" + (f" at {ser.baudrate} baud" if ser.baudrate else ""))
+        return True
+
+    def disconnect(self, reason):
+        print(f"⚠️ Lost connection to {self.port_name}: {reason}")
+        self.writer.set_port(None)
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        self.ser = None
+        self.disconnects += 1
+
+    def run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop_event.is_set():
+            if self.ser is None:
+                if self.connect():
+                    delay = RECONNECT_MIN_DELAY
+                else:
+                    self._stop_event.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            self._failed.wait(PORT_POLL_INTERVAL)
+            if self._stop_event.is_set():
+                break
+            if not self.first_frame_reported and self.writer.session_first_frame_at:
+                self.first_frame_reported = True
+                stats = self.stats()
+                print(f"⏱️ First frame {stats['connect_to_first_frame_ms']} ms after opening the port "
+                      f"({stats['startup_to_first_frame_ms']} ms after startup)")
+            if self._failed.is_set():
+                self.disconnect(f"write failed ({self.last_error})")
+            elif not self.device_present(self.port_name):
+                self.disconnect("device unplugged")
+
+        if self.ser is not None:
+            self.writer.set_port(None)
+            self.ser.close()
+            self.ser = None
+
+    def stats(self):
+        def ms_between(start, end):
+            return round((end - start) * 1000, 1) if start is not None and end is not None else None
+
+        return {
+            "connected": self.connected,
+            "port": self.port_name,
+            "baudrate": self.ser.baudrate if self.ser else None,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "last_error": self.last_error,
+            "ready_ms": None if self.ready_seconds is None else round(self.ready_seconds * 1000, 1),
+            "connect_to_first_frame_ms": ms_between(self.open_started_at, self.writer.session_first_frame_at),
+            "startup_to_first_frame_ms": ms_between(self.created_at, self.writer.first_frame_at),
+        }
+
+class NetworkConnectionManager(SerialConnectionManager):
+    """Same reconnect/replay logic for a network transport (see transports.py).
+
+    `open_transport` is called with no arguments and returns a connected transport
+    or raises OSError. There is no port to poll: failures show up as write errors.
+    """
+
+    def __init__(self, writer, name, open_transport):
+        super().__init__(writer, lambda: name)
+        self.open_transport = open_transport
+
+    def device_present(self, port_name):
+        return True
+
+    def open_port(self, port_name):
+        self.open_started_at = time.perf_counter()
+        self.ready_seconds = None
+        return self.open_transport()
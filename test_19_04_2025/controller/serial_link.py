@@ -0,0 +1,146 @@
+import json
+import os
+import struct
+import time
+from serial_protocol import (FRAME_BAUD_ACCEPT, FRAME_BAUD_PROPOSE, FRAME_PING, FRAME_PONG, FRAME_READY,
+                             ProtocolError, decode_frame, encode_frame)
+
+# ** Serial Link Negotiation**
+# Opening the port resets the ESP32. Instead of sleeping a fixed two seconds,
+# the host pings until the device answers (or sends its ready banner).
+# The ESP32 always boots at 115200. Once it is ready the host proposes
+# a faster rate, both sides switch, and a ping/pong test pattern must make
+# the round trip at the new rate. If it doesn't, both fall back to 115200
+# (the firmware reverts on its own when no valid frame arrives in time).
+# The rate that worked is saved per port in serial_baud.json, next to
+# selected_port.json, and proposed first on the next launch. If every rate
+# failed, only the time of the failure is saved: reconnects within
+# BAUD_RETRY_INTERVAL stay at 115200, later ones negotiate again, so one bad
+# boot or noisy cable doesn't pin the port at 115200 for good.
+
+DEFAULT_BAUD = 115200
+BAUD_CANDIDATES = (921600, 460800, 230400)  # Tried fastest first; CH340 bridges handle all of these
+HANDSHAKE_TIMEOUT = 0.3    # Seconds to wait for a reply frame
+SWITCH_SETTLE = 0.05       # Seconds to let both UARTs settle after a baud change
+PING_ATTEMPTS = 3
+DEVICE_REVERT_TIME = 1.0   # Firmware reverts to DEFAULT_BAUD after this long without a valid frame
+PING_PATTERN = bytes([0x00, 0xFF, 0x55, 0xAA]) * 8 + bytes(range(1, 256, 8))
+READY_TIMEOUT = 3.0        # Give up waiting for the device after this long (firmware without the handshake)
+READY_PING_INTERVAL = 0.1
+BAUD_JSON_PATH = os.path.join(os.path.dirname(__file__), "serial_baud.json")
+BAUD_RETRY_INTERVAL = 600.0  # Seconds after a failed negotiation before the port is tried again
+
+def load_baud_entries(path=None):
+    try:
+        with open(path or BAUD_JSON_PATH, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def load_saved_baud(port_name, path=None):
+    """Last rate that passed the test pattern on this port, or None."""
+    entry = load_baud_entries(path).get(port_name)
+    # Older files stored 115200 after a failure; treat that as "nothing saved"
+    return entry if isinstance(entry, int) and entry != DEFAULT_BAUD else None
+
+def negotiation_failed_recently(port_name, path=None):
+    """True if every rate failed on this port less than BAUD_RETRY_INTERVAL ago."""
+    entry = load_baud_entries(path).get(port_name)
+    if not isinstance(entry, dict):
+        return False
+    return time.time() - entry.get("failed_at", 0) < BAUD_RETRY_INTERVAL
+
+def save_baud(port_name, baud, path=None):
+    """Remember `baud` for this port; None records a failed negotiation instead."""
+    path = path or BAUD_JSON_PATH
+    saved = load_baud_entries(path)
+    saved[port_name] = baud if baud is not None else {"failed_at": time.time()}
+    try:
+        with open(path, "w") as f:
+            json.dump(saved, f, indent=2)
+    except Exception as e:
+        print(f"⚠️ Failed to write {os.path.basename(path)}: {e}")
+
+def read_frame(ser, frame_type, timeout=HANDSHAKE_TIMEOUT):
+    """Body of the next valid frame of `frame_type` (or one of a tuple of types), or None on timeout.
+
+    Anything else on the line (boot messages, frames at a wrong baud rate) is skipped.
+    """
+    frame_types = frame_type if isinstance(frame_type, tuple) else (frame_type,)
+    deadline = time.monotonic() + timeout
+    buffer = bytearray()
+    while time.monotonic() < deadline:
+        for byte in ser.read(max(1, ser.in_waiting)):
+            if byte != 0:
+                buffer.append(byte)
+                continue
+            try:
+                received_type, body = decode_frame(bytes(buffer))
+                if received_type in frame_types:
+                    return body
+            except ProtocolError:
+                pass
+            buffer.clear()
+    return None
+
+def ping(ser, pattern=PING_PATTERN, timeout=HANDSHAKE_TIMEOUT):
+    """Round-trip time in seconds of one ping/pong with `pattern`, or None if no matching pong came back."""
+    start = time.perf_counter()
+    ser.write(encode_frame(FRAME_PING, pattern))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = read_frame(ser, FRAME_PONG, deadline - time.monotonic())
+        if body == pattern:
+            return time.perf_counter() - start
+    return None
+
+def wait_until_ready(ser, timeout=READY_TIMEOUT):
+    """Seconds until the device sent its ready banner or answered a ping, or None if it never did."""
+    start = time.perf_counter()
+    old_timeout = ser.timeout
+    ser.timeout = 0.02
+    try:
+        while time.perf_counter() - start < timeout:
+            ser.write(encode_frame(FRAME_PING, b"ready?"))
+            if read_frame(ser, (FRAME_READY, FRAME_PONG), READY_PING_INTERVAL) is not None:
+                return time.perf_counter() - start
+    finally:
+        ser.timeout = old_timeout
+    return None
+
+def negotiate_baud(ser, candidates=BAUD_CANDIDATES, path=None):
+    """Switch an open DEFAULT_BAUD port (and the device) to the fastest rate that passes a ping; returns it."""
+    if negotiation_failed_recently(ser.port, path):
+        return DEFAULT_BAUD  # Don't repeat a failed negotiation on every reconnect
+    saved = load_saved_baud(ser.port, path)
+    order = [saved] + [b for b in candidates if b != saved] if saved else list(candidates)
+
+    old_timeout = ser.timeout
+    ser.timeout = 0.02
+    try:
+        for baud in order:
+            ser.reset_input_buffer()
+            ser.write(encode_frame(FRAME_BAUD_PROPOSE, struct.pack("<I", baud)))
+            reply = read_frame(ser, FRAME_BAUD_ACCEPT)
+            if reply is None or len(reply) != 4:
+                print("⚠️ Device didn't answer the baud proposal (old firmware?), staying at 115200")
+                return DEFAULT_BAUD
+            if struct.unpack("<I", reply)[0] != baud:
+                continue  # Declined this rate
+
+            ser.flush()
+            ser.baudrate = baud
+            time.sleep(SWITCH_SETTLE)
+            if any(ping(ser) is not None for _ in range(PING_ATTEMPTS)):
+                save_baud(ser.port, baud, path)
+                print(f"✅ Serial link running at {baud} baud")
+                return baud
+
+            print(f"⚠️ Test pattern failed at {baud} baud, falling back to 115200")
+            ser.baudrate = DEFAULT_BAUD
+            time.sleep(DEVICE_REVERT_TIME)
+
+        save_baud(ser.port, None, path)
+        return DEFAULT_BAUD
+    finally:
+        ser.timeout = old_timeout
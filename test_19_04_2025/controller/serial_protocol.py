@@ -0,0 +1,373 @@
+import json
+import time
+import struct
+import binascii
+
+# ** Binary Serial Protocol**
+# Frames sent to the ESP32 instead of JSON lines. On the wire each frame is
+#   COBS( version | type | length (u16 LE) | body | crc16 (u16 LE) ) 0x00
+# COBS removes every 0x00 from the frame so the trailing 0x00 always marks its
+# end, and the CRC (CRC-16/CCITT-FALSE over version..body) lets the device
+# drop corrupted frames. A state body is
+#   flags | brightness | mouse speed (u16 LE, 1/100) | sensitivity | heaters | led count | R G B ...
+#   [ band count | band levels ... ]   (only with FLAG_HAS_BANDS)
+# which is ~80 bytes for 24 LEDs instead of ~700 as JSON. The matching parser
+# lives in esp32/final/final.ino (readSerialFrames).
+#
+# Between keyframes (full state frames) DeltaEncoder sends delta frames that
+# patch the previous state body:
+#   field mask | changed fields | range count | (start, count, R G B ...) per LED range
+# Field mask bit 5 means all band levels follow the changed fields.
+
+PROTOCOL_VERSION = 1
+PROTOCOL_BINARY = "binary"
+PROTOCOL_JSON = "json"         # Old newline-terminated JSON, for firmware without the binary parser
+DEFAULT_PROTOCOL = PROTOCOL_BINARY
+
+FRAME_STATE = 0x01             # Full device state (keyframe)
+FRAME_DELTA = 0x02             # Changed fields / LED ranges relative to the previous state
+FRAME_BAUD_PROPOSE = 0x10      # Host -> device: u32 LE baud rate to switch to
+FRAME_BAUD_ACCEPT = 0x11       # Device -> host: u32 LE baud rate it switches to (115200 = declined)
+FRAME_PING = 0x12              # Host -> device: arbitrary test pattern
+FRAME_PONG = 0x13              # Device -> host: the ping's body echoed back
+FRAME_READY = 0x14             # Device -> host: sent once setup() is done (protocol version, LED colors)
+FRAME_MARK = 0x15              # Host -> device: u16 LE sequence number of the frame just sent
+FRAME_ACK = 0x16               # Device -> host: u16 LE sequence number, sent after the next strip.show()
+
+FLAG_LIGHTS_ENABLED = 0x01
+FLAG_VIBRATION = 0x02
+FLAG_SYNC_WITH_AUDIO = 0x04
+FLAG_MOUSE_CONTROL = 0x08
+FLAG_HAS_BRIGHTNESS = 0x10
+FLAG_HAS_MOUSE_SPEED = 0x20
+FLAG_HAS_COLORS = 0x40
+FLAG_HAS_BANDS = 0x80
+
+HEADER = struct.Struct("<BBH")
+STATE_HEADER = struct.Struct("<BBHBBB")
+MAX_LEDS = 255
+MAX_BANDS = 16
+MOUSE_SPEED_SCALE = 100
+
+# (offset, size) of the state-header fields a delta can carry, in field-mask bit order:
+# flags, brightness, mouse speed, sensitivity, heaters. The LED count only changes in keyframes.
+DELTA_FIELDS = ((0, 1), (1, 1), (2, 2), (4, 1), (5, 1))
+DELTA_BANDS_BIT = 0x20
+KEYFRAME_INTERVAL = 2.0        # Seconds between full frames, so a reset device recovers quickly
+RANGE_MERGE_GAP = 1            # Unchanged LEDs allowed inside one range (a new range costs 2 bytes)
+
+class ProtocolError(ValueError):
+    """A received frame is truncated, corrupted or from an unknown protocol version."""
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+def cobs_encode(data):
+    """Consistent Overhead Byte Stuffing: returns `data` without any 0x00 bytes (delimiter not included)."""
+    out = bytearray()
+    block = bytearray()
+    for byte in data:
+        if byte == 0:
+            out.append(len(block) + 1)
+            out += block
+            block.clear()
+        else:
+            block.append(byte)
+            if len(block) == 254:
+                out.append(255)
+                out += block
+                block.clear()
+    out.append(len(block) + 1)
+    out += block
+    return bytes(out)
+
+def cobs_decode(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        code = data[i]
+        if code == 0 or i + code > len(data):
+            raise ProtocolError("bad COBS block")
+        out += data[i + 1:i + code]
+        i += code
+        if code < 255 and i < len(data):
+            out.append(0)
+    return bytes(out)
+
+def clamp_byte(value):
+    return min(255, max(0, int(value)))
+
+def encode_state(state):
+    """Pack a send_data payload dict (LEDColors, Brightness, MouseSpeed, heaters, ...) into a state body."""
+    flags = 0
+    if state.get("lights_enabled", True):
+        flags |= FLAG_LIGHTS_ENABLED
+    if state.get("vibration"):
+        flags |= FLAG_VIBRATION
+    if state.get("sync_with_audio"):
+        flags |= FLAG_SYNC_WITH_AUDIO
+    if state.get("mouse"):
+        flags |= FLAG_MOUSE_CONTROL
+    if "Brightness" in state:
+        flags |= FLAG_HAS_BRIGHTNESS
+    if "MouseSpeed" in state:
+        flags |= FLAG_HAS_MOUSE_SPEED
+
+    colors = state.get("LEDColors")
+    rgb = b""
+    if colors is not None:
+        flags |= FLAG_HAS_COLORS
+        colors = colors[:MAX_LEDS]
+        rgb = bytes(clamp_byte(c[k]) for c in colors for k in ("R", "G", "B"))
+
+    bands = state.get("Bands")
+    band_bytes = b""
+    if bands is not None:
+        flags |= FLAG_HAS_BANDS
+        bands = bands[:MAX_BANDS]
+        band_bytes = bytes([len(bands)]) + bytes(clamp_byte(level) for level in bands)
+
+    heaters = 0
+    for i, level in enumerate(state.get("heaters", [0, 0, 0])[:3]):
+        heaters |= (min(3, max(0, int(level))) << (2 * i))
+
+    mouse_speed = min(0xFFFF, max(0, round(state.get("MouseSpeed", 0) * MOUSE_SPEED_SCALE)))
+    return STATE_HEADER.pack(
+        flags,
+        clamp_byte(state.get("Brightness", 0)),
+        mouse_speed,
+        clamp_byte(state.get("sensitivity", 0)),
+        heaters,
+        len(rgb) // 3,
+    ) + rgb + band_bytes
+
+def band_offset(body):
+    """Where the band section starts in a state body (its band count byte)."""
+    return STATE_HEADER.size + 3 * body[6]
+
+def decode_state(body):
+    """Inverse of encode_state: returns the payload dict the JSON protocol would have carried."""
+    if len(body) < STATE_HEADER.size:
+        raise ProtocolError("state frame too short")
+    flags, brightness, mouse_speed, sensitivity, heaters, led_count = STATE_HEADER.unpack_from(body)
+    rgb = body[STATE_HEADER.size:band_offset(body)]
+    bands = body[band_offset(body):]
+    if flags & FLAG_HAS_BANDS:
+        if not bands or len(bands) != 1 + bands[0]:
+            raise ProtocolError("band section doesn't match its band count")
+        bands = bands[1:]
+    elif bands:
+        raise ProtocolError(f"expected {led_count} LEDs, got {len(body) - STATE_HEADER.size} color bytes")
+    if len(rgb) != 3 * led_count:
+        raise ProtocolError(f"expected {led_count} LEDs, got {len(rgb)} color bytes")
+
+    state = {}
+    if flags & FLAG_HAS_COLORS:
+        state["LEDColors"] = [{"R": rgb[i], "G": rgb[i + 1], "B": rgb[i + 2]} for i in range(0, len(rgb), 3)]
+    if flags & FLAG_HAS_BRIGHTNESS:
+        state["Brightness"] = brightness
+    if flags & FLAG_HAS_BANDS:
+        state["Bands"] = list(bands)
+    state["lights_enabled"] = bool(flags & FLAG_LIGHTS_ENABLED)
+    if flags & FLAG_MOUSE_CONTROL:
+        state["mouse"] = True
+    if flags & FLAG_HAS_MOUSE_SPEED:
+        state["MouseSpeed"] = mouse_speed / MOUSE_SPEED_SCALE
+    state["sensitivity"] = sensitivity
+    state["heaters"] = [(heaters >> (2 * i)) & 0x3 for i in range(3)]
+    state["vibration"] = bool(flags & FLAG_VIBRATION)
+    state["sync_with_audio"] = bool(flags & FLAG_SYNC_WITH_AUDIO)
+    return state
+
+def encode_delta(previous, current):
+    """Delta body turning state body `previous` into `current` (same LED and band count)."""
+    mask = 0
+    fields = b""
+    for bit, (offset, size) in enumerate(DELTA_FIELDS):
+        if current[offset:offset + size] != previous[offset:offset + size]:
+            mask |= 1 << bit
+            fields += current[offset:offset + size]
+    bands_at = band_offset(current) + 1
+    if current[bands_at:] != previous[bands_at:]:
+        mask |= DELTA_BANDS_BIT
+        fields += current[bands_at:]
+
+    ranges = []
+    led_count = current[6]
+    i = 0
+    while i < led_count:
+        at = STATE_HEADER.size + 3 * i
+        if current[at:at + 3] == previous[at:at + 3]:
+            i += 1
+            continue
+        start = end = i
+        i += 1
+        while i < led_count and i - end <= RANGE_MERGE_GAP + 1:
+            at = STATE_HEADER.size + 3 * i
+            if current[at:at + 3] != previous[at:at + 3]:
+                end = i
+            i += 1
+        i = end + 1
+        ranges.append((start, end - start + 1))
+
+    body = bytearray([mask]) + fields + bytes([len(ranges)])
+    for start, count in ranges:
+        at = STATE_HEADER.size + 3 * start
+        body += bytes([start, count]) + current[at:at + 3 * count]
+    return bytes(body)
+
+def apply_delta(previous, delta):
+    """Patch state body `previous` with a delta body; returns the new state body."""
+    body = bytearray(previous)
+    try:
+        mask = delta[0]
+        pos = 1
+        for bit, (offset, size) in enumerate(DELTA_FIELDS):
+            if mask & (1 << bit):
+                body[offset:offset + size] = delta[pos:pos + size]
+                pos += size
+        if mask & DELTA_BANDS_BIT:
+            bands_at = band_offset(body) + 1
+            count = len(body) - bands_at
+            if count <= 0 or pos + count > len(delta):
+                raise ProtocolError("band levels in a delta without a band section")
+            body[bands_at:] = delta[pos:pos + count]
+            pos += count
+        range_count = delta[pos]
+        pos += 1
+        for _ in range(range_count):
+            start, count = delta[pos], delta[pos + 1]
+            pos += 2
+            if start + count > body[6] or pos + 3 * count > len(delta):
+                raise ProtocolError("LED range outside the current state")
+            at = STATE_HEADER.size + 3 * start
+            body[at:at + 3 * count] = delta[pos:pos + 3 * count]
+            pos += 3 * count
+    except IndexError:
+        raise ProtocolError("delta frame truncated")
+    if pos != len(delta):
+        raise ProtocolError("trailing bytes after delta")
+    return bytes(body)
+
+def encode_frame(frame_type, body):
+    """Wrap a body in header + CRC, COBS-encode it and append the 0x00 delimiter."""
+    raw = HEADER.pack(PROTOCOL_VERSION, frame_type, len(body)) + body
+    raw += struct.pack("<H", crc16(raw))
+    return cobs_encode(raw) + b"\x00"
+
+def decode_frame(encoded):
+    """Decode one COBS frame (with or without its 0x00 delimiter); returns (frame_type, body)."""
+    raw = cobs_decode(encoded.rstrip(b"\x00"))
+    if len(raw) < HEADER.size + 2:
+        raise ProtocolError("frame too short")
+    (crc,) = struct.unpack_from("<H", raw, len(raw) - 2)
+    if crc16(raw[:-2]) != crc:
+        raise ProtocolError("CRC mismatch")
+    version, frame_type, length = HEADER.unpack_from(raw)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version {version}")
+    body = raw[HEADER.size:-2]
+    if len(body) != length:
+        raise ProtocolError(f"length field says {length} bytes, got {len(body)}")
+    return frame_type, body
+
+def encode_payload(state, protocol=DEFAULT_PROTOCOL):
+    """Bytes to write to the serial port for one send_data payload."""
+    if protocol == PROTOCOL_JSON:
+        return f"{json.dumps(state)}\n".encode()
+    return encode_frame(FRAME_STATE, encode_state(state))
+
+class DeltaEncoder:
+    """Remembers the last state sent to the device and sends only what changed since then."""
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.last_body = None
+        self.last_keyframe_time = 0.0
+
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+        self.bytes_sent = 0
+        self.bytes_full = 0   # What the same frames would have cost as keyframes
+
+    def reset(self):
+        """Force a keyframe next, e.g. after the port was reopened or the device reset."""
+        self.last_body = None
+
+    def encode(self, state, now=None):
+        """Frame bytes for one send_data payload: a keyframe when due, otherwise a delta."""
+        now = time.monotonic() if now is None else now
+        body = encode_state(state)
+        keyframe = encode_frame(FRAME_STATE, body)
+        self.bytes_full += len(keyframe)
+
+        frame = None
+        keyframe_due = now - self.last_keyframe_time >= self.keyframe_interval
+        same_layout = self.last_body is not None and len(self.last_body) == len(body) and self.last_body[6] == body[6]
+        if same_layout and not keyframe_due:
+            delta = encode_frame(FRAME_DELTA, encode_delta(self.last_body, body))
+            if len(delta) < len(keyframe):
+                frame = delta
+                self.deltas_sent += 1
+        if frame is None:
+            frame = keyframe
+            self.keyframes_sent += 1
+            self.last_keyframe_time = now
+
+        self.last_body = body
+        self.bytes_sent += len(frame)
+        return frame
+
+    def stats(self):
+        return {
+            "keyframes_sent": self.keyframes_sent,
+            "deltas_sent": self.deltas_sent,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_full - self.bytes_sent,
+            "compression": round(self.bytes_full / max(1, self.bytes_sent), 2),
+        }
+
+class FrameDecoder:
+    """Reassembles a byte stream into payload dicts; accepts binary frames and JSON lines alike."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.state_body = None   # Last full state, the base for delta frames
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+
+    def feed(self, data):
+        """Consume received bytes; returns the list of complete payloads they finished."""
+        states = []
+        for byte in data:
+            if byte == 0:
+                self._finish_binary(states)
+            elif byte == 0x0A and self.buffer[:1] == b"{":
+                self._finish_json(states)
+            else:
+                self.buffer.append(byte)
+        return states
+
+    def _finish_binary(self, states):
+        try:
+            frame_type, body = decode_frame(bytes(self.buffer))
+            if frame_type == FRAME_DELTA:
+                if self.state_body is None:
+                    raise ProtocolError("delta frame before the first keyframe")
+                body = apply_delta(self.state_body, body)
+            elif frame_type != FRAME_STATE:
+                raise ProtocolError(f"unknown frame type {frame_type}")
+            states.append(decode_state(body))
+            self.state_body = body
+            self.frames_decoded += 1
+        except ProtocolError:
+            self.frames_dropped += 1
+        self.buffer.clear()
+
+    def _finish_json(self, states):
+        try:
+            states.append(json.loads(self.buffer.decode().rstrip("\r")))
+            self.frames_decoded += 1
+        except ValueError:
+            self.frames_dropped += 1
+        self.buffer.clear()
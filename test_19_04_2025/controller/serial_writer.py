@@ -0,0 +1,170 @@
+import struct
+import threading
+import time
+import serial
+from serial_protocol import DEFAULT_PROTOCOL, FRAME_MARK, PROTOCOL_JSON, DeltaEncoder, encode_frame, encode_payload
+
+# ** Serial Writer**
+# The only thread that writes to the ESP32. Producers put payload dicts into a
+# one-slot latest-value mailbox; a payload that hasn't been picked up yet is
+# replaced (coalesced) by the next one instead of queueing behind it. The
+# writer encodes each payload it takes exactly once (so delta frames always
+# follow the state the device actually got) and never writes faster than the
+# wire drains at the configured baud rate. With `tag_frames` on, each binary
+# frame is followed by a sequence-number mark for latency.LatencyTracker.
+
+WIRE_BITS_PER_BYTE = 10    # 8N1: start + 8 data + stop bit
+WIRE_BUDGET_FRACTION = 0.9 # Leave some headroom below the raw line rate
+
+class LatestValueMailbox:
+    """Single-slot mailbox: put() overwrites an untaken value instead of queueing it."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._value = None
+        self._full = False
+        self.produced = 0
+        self.coalesced = 0
+
+    def put(self, value):
+        with self._cond:
+            if self._full:
+                self.coalesced += 1
+            self._value = value
+            self._full = True
+            self.produced += 1
+            self._cond.notify()
+
+    def has_value(self):
+        return self._full
+
+    def take(self, timeout=None):
+        """Return the newest value (or None after `timeout`) and empty the slot."""
+        with self._cond:
+            if not self._full:
+                self._cond.wait(timeout)
+            if not self._full:
+                return None
+            value = self._value
+            self._value = None
+            self._full = False
+            return value
+
+class SerialWriter(threading.Thread):
+    """Transmits the newest payload at most once, within the baud rate's byte budget."""
+
+    def __init__(self, port=None, baudrate=115200, latency=None):
+        super().__init__(daemon=True)
+        self.port = port
+        self.set_baudrate(baudrate)
+        self.mailbox = LatestValueMailbox()
+        self.encoder = DeltaEncoder()
+        self.latency = latency               # LatencyTracker fed with encode/write timings and frame tags
+        self.tag_frames = False
+        self.protocol_override = None        # e.g. PROTOCOL_JSON for firmware that never answered the handshake
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_replayed = 0
+        self.bytes_sent = 0
+        self.last_item = None
+        self.first_frame_at = None           # perf_counter() of the first frame ever written
+        self.session_first_frame_at = None   # ... and of the first one on the current port
+        self.on_write_error = None   # Called with the exception when a write fails
+        self._stop_event = threading.Event()
+
+    def submit(self, payload, protocol=DEFAULT_PROTOCOL, captured_at=None):
+        """Hand one send_data payload to the writer; replaces any payload still waiting.
+
+        `captured_at` is the perf_counter() time of the screen grab the payload came from, if any.
+        """
+        self.last_item = (payload, protocol, captured_at)
+        self.mailbox.put(self.last_item)
+
+    def replay_last(self):
+        """Resend the newest payload (as a keyframe) unless a newer one is already waiting."""
+        if self.last_item is not None and not self.mailbox.has_value():
+            self.frames_replayed += 1
+            self.mailbox.put(self.last_item[:2] + (None,))
+
+    def set_baudrate(self, baudrate):
+        self.bytes_per_second = baudrate / WIRE_BITS_PER_BYTE * WIRE_BUDGET_FRACTION
+
+    def set_port(self, port):
+        """Switch to a (re)opened port; the next binary frame is a keyframe."""
+        if port is not None:
+            if getattr(port, "bytes_per_second", None):
+                self.bytes_per_second = port.bytes_per_second   # Network transport
+            else:
+                self.set_baudrate(port.baudrate)
+        self.port = port
+        self.session_first_frame_at = None
+        if self.latency is not None:
+            self.latency.set_port(port)
+        self.encoder.reset()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def encode(self, payload, protocol):
+        if protocol == PROTOCOL_JSON:
+            self.encoder.reset()
+            return encode_payload(payload, PROTOCOL_JSON)
+        return self.encoder.encode(payload)
+
+    def run(self):
+        wire_free_at = time.perf_counter()
+        while not self._stop_event.is_set():
+            # Wait until the previous frame has drained; newer payloads coalesce meanwhile
+            delay = wire_free_at - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            item = self.mailbox.take(timeout=0.1)
+            if item is None:
+                continue
+
+            port = self.port
+            if port is None:
+                self.frames_dropped += 1
+                self.encoder.reset()
+                continue
+            payload, protocol, captured_at = item
+            protocol = self.protocol_override or protocol
+            encode_start = time.perf_counter()
+            data = self.encode(payload, protocol)
+            write_start = time.perf_counter()
+            tagged = self.tag_frames and self.latency is not None and protocol != PROTOCOL_JSON
+            if tagged:
+                seq = self.latency.tag(write_start, captured_at)
+                data += encode_frame(FRAME_MARK, struct.pack("<H", seq))
+            try:
+                port.write(data)
+            except (serial.SerialTimeoutException, serial.SerialException, OSError) as e:
+                print(f"⚠️ Serial write failed, frame dropped: {e}")
+                self.frames_dropped += 1
+                self.encoder.reset()
+                if self.on_write_error:
+                    self.on_write_error(e)
+                continue
+
+            if self.latency is not None:
+                self.latency.record("encode", write_start - encode_start)
+                self.latency.record("write", time.perf_counter() - write_start)
+            self.frames_sent += 1
+            self.bytes_sent += len(data)
+            if self.session_first_frame_at is None:
+                self.session_first_frame_at = time.perf_counter()
+                self.first_frame_at = self.first_frame_at or self.session_first_frame_at
+            wire_free_at = max(wire_free_at, time.perf_counter()) + len(data) / self.bytes_per_second
+
+    def stats(self):
+        return {
+            "frames_produced": self.mailbox.produced,
+            "frames_sent": self.frames_sent,
+            "frames_coalesced": self.mailbox.coalesced,
+            "frames_dropped": self.frames_dropped,
+            "frames_replayed": self.frames_replayed,
+            "bytes_sent": self.bytes_sent,
+            "byte_budget_per_second": round(self.bytes_per_second),
+            "protocol_override": self.protocol_override,
+            "encoding": self.encoder.stats(),
+        }
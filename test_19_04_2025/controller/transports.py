@@ -0,0 +1,96 @@
+import random
+import socket
+import struct
+
+try:
+    import websocket  # websocket-client, only needed for "websocket" devices
+except ImportError:
+    websocket = None
+
+# ** Network Transports**
+# Drop-in replacements for the serial port object the SerialWriter and
+# LatencyTracker use (write / read / in_waiting / close). They send the same
+# COBS frames over Wi-Fi, one datagram or message per write, each prefixed
+# with a u32 LE session id and a u32 LE sequence number. The device drops
+# anything that isn't newer than what it already applied, so a late UDP packet
+# can't roll the LEDs back. Every transport picks a random session id, so a
+# restarted host is accepted even though its sequence numbers begin again at 0.
+# Frames sent to 255.255.255.255 (or a subnet broadcast) reach every hoodie on
+# the LAN. Device replies (PONG, ACK) come back as bare frames without the header.
+
+UDP_DEFAULT_PORT = 4210
+NETWORK_BYTES_PER_SECOND = 1_000_000   # Writer byte budget; far above what a frame stream needs
+READ_TIMEOUT = 0.1
+SEQUENCE_HEADER = struct.Struct("<II")   # session id, sequence number
+
+def parse_address(address, default_port=UDP_DEFAULT_PORT):
+    """'host' or 'host:port' -> (host, port)."""
+    host, _, port = address.partition(":")
+    return host, int(port) if port else default_port
+
+class UdpTransport:
+    """Frames as UDP datagrams to one hoodie, or to every hoodie with broadcast=True."""
+
+    baudrate = None
+    bytes_per_second = NETWORK_BYTES_PER_SECOND
+    in_waiting = 0
+
+    def __init__(self, address, broadcast=False):
+        self.address = parse_address(address)
+        self.session = random.getrandbits(32)
+        self.sequence = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if broadcast:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.settimeout(READ_TIMEOUT)
+
+    def write(self, data):
+        self.sock.sendto(SEQUENCE_HEADER.pack(self.session, self.sequence) + data, self.address)
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+
+    def read(self, size=1):
+        try:
+            data, _ = self.sock.recvfrom(4096)
+            return data
+        except socket.timeout:
+            return b""
+
+    def close(self):
+        self.sock.close()
+
+class WebSocketTransport:
+    """Frames as binary WebSocket messages, for firmware that runs a WebSocket server."""
+
+    baudrate = None
+    bytes_per_second = NETWORK_BYTES_PER_SECOND
+    in_waiting = 0
+
+    def __init__(self, url):
+        if websocket is None:
+            raise OSError("websocket-client is not installed (pip install websocket-client)")
+        self.session = random.getrandbits(32)
+        self.sequence = 0
+        try:
+            self.ws = websocket.create_connection(url, timeout=2)
+        except Exception as e:
+            raise OSError(f"WebSocket connect to {url} failed: {e}")
+        self.ws.settimeout(READ_TIMEOUT)
+
+    def write(self, data):
+        try:
+            self.ws.send_binary(SEQUENCE_HEADER.pack(self.session, self.sequence) + data)
+        except Exception as e:
+            raise OSError(f"WebSocket send failed: {e}")
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+
+    def read(self, size=1):
+        try:
+            message = self.ws.recv()
+        except websocket.WebSocketTimeoutException:
+            return b""
+        except Exception as e:
+            raise OSError(f"WebSocket receive failed: {e}")
+        return message if isinstance(message, bytes) else message.encode()
+
+    def close(self):
+        self.ws.close()
@@ -229,6 +229,7 @@ CONTROL_JSON_PATH = os.path.join(os.path.dirname(__file__), "control_state.json"
 VB_SETUP_STATE_PATH = os.path.join(os.path.dirname(__file__), "vb_setup_state.json")
 SHUTDOWN_FLAG_PATH = os.path.join(os.path.dirname(__file__), "shutdown_flag.json")
 SELECTED_PORT_PATH = os.path.join(os.path.dirname(__file__), "selected_port.json")
+STATS_JSON_PATH = os.path.join(os.path.dirname(__file__), "pipeline_stats.json")
 
 
 def load_state_from_json():
@@ -310,10 +311,12 @@ def toggle(data):
 
     if key == "sensitivity":
         state["sensitivity"] = data["value"]
+    elif key in ["color_saturation", "color_gamma", "white_balance", "serial_protocol", "audio_preset", "audio_gain"]:
+        state[key] = data["value"]
     elif key.startswith("heater"):
         idx = int(key[-1]) - 1
         state["heaters"][idx] = data["value"]
-    elif key in ["audio", "screen", "mouse", "vibration", "sync_with_audio"]:
+    elif key in ["audio", "screen", "mouse", "vibration", "sync_with_audio", "latency_tracking"]:
         state[key] = not state.get(key, False)
     elif key == "lights_enabled":
         state["lights_enabled"] = data.get("value", not state.get("lights_enabled", True))
@@ -350,26 +353,45 @@ def get_serial_ports():
     ]
 
 
+def load_selected_port_config():
+    """selected_port.json as a dict ({} if it doesn't exist yet), or None if it can't be read."""
+    if not os.path.exists(SELECTED_PORT_PATH):
+        return {}
+    try:
+        with open(SELECTED_PORT_PATH, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Failed to read selected_port.json: {e}")
+        return None
+
+
+def selected_devices(config):
+    """Device entries the backend will use: the "devices" list, or the single selected port."""
+    if "devices" in config:
+        return config["devices"]
+    if config.get("udp") or config.get("websocket"):
+        return [config]
+    return [{"port": config["port"]}] if config.get("port") else []
+
+
 @app.route("/ports")
 def ports():
     ports = get_serial_ports()
-    selected_port = None
-
-    if os.path.exists(SELECTED_PORT_PATH):
-        try:
-            with open(SELECTED_PORT_PATH, "r") as f:
-                selected_data = json.load(f)
-                selected_port = selected_data.get("port")
-        except Exception as e:
-            print(f"⚠️ Failed to read selected_port.json: {e}")
+    config = load_selected_port_config()
+    devices = selected_devices(config or {})
+    serial_ports = [d["port"] for d in devices if d.get("port")]
+    network_only = bool(devices) and not serial_ports   # Wi-Fi hoodies only: no USB port is needed
 
     response = {
         "ports": ports,
         "auto_connected": False,
-        "selected_port": selected_port
+        "selected_port": serial_ports[0] if serial_ports else None,
+        "selected_devices": [d.get("port") or d.get("udp") or d.get("websocket") for d in devices],
+        "network_only": network_only
     }
 
-    if len(ports) == 1:
+    # A "devices" list (fan-out to several hoodies) or a Wi-Fi device is never replaced by the single-port auto-save
+    if len(ports) == 1 and config is not None and "devices" not in config and not network_only:
         try:
             with open(SELECTED_PORT_PATH, "w") as f:
                 json.dump({"port": ports[0]["device"]}, f)
@@ -422,6 +444,16 @@ def run_server():
 
     socketio.run(app, host="0.0.0.0", port=5000)
 
+@app.route("/stats")
+def stats():
+    """Pipeline counters published by backend.py (static-screen skips, capture rate, ...)."""
+    try:
+        with open(STATS_JSON_PATH, "r") as f:
+            return jsonify(json.load(f))
+    except Exception as e:
+        return jsonify({"status": "unavailable", "message": str(e)}), 503
+
+
 @app.route("/check_led_points")
 def check_led_points():
     led_path = os.path.join(os.path.dirname(__file__), "led_points.json")